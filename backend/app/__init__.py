@@ -27,6 +27,17 @@ def create_app(config_class=Config):
     db.init_app(app)
     migrate.init_app(app, db)
     
+    from app.services.cache import init_response_cache
+    init_response_cache(app)
+    from app.services.follow_graph import init_follow_graph
+    init_follow_graph(app)
+    from app.services.search_index import init_search_index
+    init_search_index(app)
+    from app.services.read_receipts import init_read_receipts
+    init_read_receipts(app)
+    from app.services.expiry import init_expiry_sweeper
+    init_expiry_sweeper(app)
+    
     # Configure CORS with proper settings for sessions
     CORS(app, 
          origins=app.config.get('CORS_ORIGINS', ['http://localhost:3000']),
@@ -47,7 +58,7 @@ def create_app(config_class=Config):
             return response
     
     # Import models first to register them
-    from app.models import User, Post, Like, Comment, Follow, Message, Note, Party, PartyMessage, PartyJoinRequest
+    from app.models import User, Post, Like, Comment, Follow, Message, Note, Party, PartyMessage, PartyJoinRequest, TimelineEntry, PostImageVariant, AvatarVariant, UserSuggestion, Conversation
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -79,6 +90,22 @@ def create_app(config_class=Config):
             'version': '2.0.0'
         }), 200
     
+    # Runtime metrics for caches and background jobs
+    @app.route('/api/metrics')
+    def metrics():
+        from app.services.cache import get_response_cache
+        from app.services.follow_graph import get_follow_graph
+        from app.services.search_index import get_search_index
+        from app.services.read_receipts import get_read_receipts
+        from app.services.expiry import get_expiry_sweeper
+        return jsonify({
+            'response_cache': get_response_cache().stats(),
+            'follow_graph': get_follow_graph().stats(),
+            'user_search_index': get_search_index().stats(),
+            'read_receipts': get_read_receipts().stats(),
+            'expiry_sweeper': get_expiry_sweeper().stats()
+        }), 200
+    
     # Create tables
     with app.app_context():
         db.create_all()
@@ -1,6 +1,13 @@
 # Import all models from the models.py file
 from .models import User, Post, Like, Comment, Follow, Message, Party, PartyMessage, PartyJoinRequest
 from .note import Note
+from .timeline import TimelineEntry
+from .media import PostImageVariant, AvatarVariant, MediaDeletion
+from .suggestion import UserSuggestion
+from .conversation import Conversation
+from .message_event import MessageEvent
+from .delivery import PendingDelivery
+from .message_term import MessageTerm
 
 # Make sure all models are available when importing from app.models
-__all__ = ['User', 'Post', 'Like', 'Comment', 'Follow', 'Message', 'Note', 'Party', 'PartyMessage', 'PartyJoinRequest']
\ No newline at end of file
+__all__ = ['User', 'Post', 'Like', 'Comment', 'Follow', 'Message', 'Note', 'Party', 'PartyMessage', 'PartyJoinRequest', 'TimelineEntry', 'PostImageVariant', 'AvatarVariant', 'MediaDeletion', 'UserSuggestion', 'Conversation', 'MessageEvent', 'PendingDelivery', 'MessageTerm']
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""Conversation Model - per-pair inbox summary of direct messages"""
+from datetime import datetime
+from app import db
+
+
+class Conversation(db.Model):
+    __tablename__ = 'conversation'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # The pair is stored ordered, user_a_id < user_b_id
+    user_a_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    user_b_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    # message.conversation_id points back here, so this side is added with ALTER
+    last_message_id = db.Column(db.Integer, db.ForeignKey(
+        'message.id', ondelete='SET NULL', use_alter=True, name='fk_conversation_last_message'))
+    last_message_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_sender_id = db.Column(db.Integer)
+    last_message_type = db.Column(db.String(20))
+    last_message_preview = db.Column(db.String(200))
+    unread_a = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # unread by user_a
+    unread_b = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # unread by user_b
+    # Read watermarks: each participant has read every message up to this id
+    read_up_to_a = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    read_up_to_b = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_a_id', 'user_b_id', name='unique_conversation_pair'),
+        # Each participant's inbox is a range scan over one of these, newest first
+        db.Index('ix_conversation_a_last', 'user_a_id', 'last_message_at', 'id'),
+        db.Index('ix_conversation_b_last', 'user_b_id', 'last_message_at', 'id'),
+    )
+
+    def other_user_id(self, user_id):
+        return self.user_b_id if user_id == self.user_a_id else self.user_a_id
+
+    def unread_for(self, user_id):
+        return self.unread_a if user_id == self.user_a_id else self.unread_b
+
+    def read_up_to(self, user_id):
+        return self.read_up_to_a if user_id == self.user_a_id else self.read_up_to_b
+
+    def has_read(self, user_id, message_id):
+        return message_id <= self.read_up_to(user_id)
+
+    def __repr__(self):
+        return f'<Conversation {self.user_a_id} <-> {self.user_b_id}>'
@@ -0,0 +1,20 @@
+"""Pending Delivery Model - messages waiting for an offline recipient's socket"""
+from datetime import datetime
+from app import db
+
+
+class PendingDelivery(db.Model):
+    __tablename__ = 'pending_delivery'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Draining and acking a user's queue are range scans in delivery order
+        db.Index('ix_pending_delivery_user_id', 'user_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<PendingDelivery {self.id} message={self.message_id} for {self.user_id}>'
@@ -0,0 +1,60 @@
+"""Media Models - derived image variants stored in the blob store, and pending media deletions"""
+from datetime import datetime
+from app import db
+
+
+class PostImageVariant(db.Model):
+    __tablename__ = 'post_image_variant'
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+    name = db.Column(db.String(20), nullable=False)  # thumb, feed, full
+    blob_key = db.Column(db.String(64), nullable=False)
+    mimetype = db.Column(db.String(100), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+
+    post = db.relationship('Post', backref=db.backref('image_variants', lazy='dynamic', cascade='all, delete-orphan'))
+
+    __table_args__ = (db.UniqueConstraint('post_id', 'name', name='unique_post_image_variant'),)
+
+    def to_dict(self):
+        return {
+            'url': f'/api/posts/{self.post_id}/image?variant={self.name}',
+            'width': self.width,
+            'height': self.height,
+            'mimetype': self.mimetype
+        }
+
+    def __repr__(self):
+        return f'<PostImageVariant post={self.post_id} {self.name} {self.width}x{self.height}>'
+
+
+class AvatarVariant(db.Model):
+    __tablename__ = 'avatar_variant'
+
+    id = db.Column(db.Integer, primary_key=True)
+    avatar_key = db.Column(db.String(64), nullable=False)  # blob key of the original upload
+    size = db.Column(db.Integer, nullable=False)  # square edge in pixels
+    blob_key = db.Column(db.String(64), nullable=False)
+    mimetype = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('avatar_key', 'size', name='unique_avatar_variant'),)
+
+    def __repr__(self):
+        return f'<AvatarVariant {self.avatar_key[:12]} {self.size}px>'
+
+
+class MediaDeletion(db.Model):
+    """Storage path of swept message media, waiting for its owner's client to delete it"""
+    __tablename__ = 'media_deletion'
+
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (db.Index('ix_media_deletion_owner_id', 'owner_id', 'id'),)
+
+    def __repr__(self):
+        return f'<MediaDeletion {self.owner_id} {self.path}>'
@@ -0,0 +1,29 @@
+"""Message Event Model - per-user change log behind /api/messages/sync"""
+from datetime import datetime
+from app import db
+
+
+class MessageEvent(db.Model):
+    __tablename__ = 'message_event'
+
+    # The auto-increment id is the sync cursor: it only ever grows, though not in
+    # commit order, so cursors stay behind recent events (see message_sync.latest_cursor)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)  # who is notified
+    kind = db.Column(db.String(10), nullable=False)  # message, read, delete
+    conversation_id = db.Column(db.Integer)
+    message_id = db.Column(db.Integer)  # the new or deleted message
+    actor_id = db.Column(db.Integer)  # sender of a message, or the reader
+    read_up_to = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # A client's sync is a range scan over its own events after the cursor
+        db.Index('ix_message_event_user_id', 'user_id', 'id'),
+        db.Index('ix_message_event_created_at', 'created_at'),
+        # Never reuse ids of pruned events, or old cursors would skip new ones
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f'<MessageEvent {self.id} {self.kind} for {self.user_id}>'
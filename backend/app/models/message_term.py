@@ -0,0 +1,21 @@
+"""Message Term Model - per-user inverted index over direct message text"""
+from app import db
+
+
+class MessageTerm(db.Model):
+    __tablename__ = 'message_term'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)  # whose index
+    term = db.Column(db.String(64), nullable=False)
+    message_id = db.Column(db.Integer, db.ForeignKey('message.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # the message's, for newest-first pages
+
+    __table_args__ = (
+        # Exact and prefix lookups are range scans over one user's terms, newest first
+        db.Index('ix_message_term_user_term_created', 'user_id', 'term', 'created_at', 'message_id'),
+        db.Index('ix_message_term_message_id', 'message_id'),
+    )
+
+    def __repr__(self):
+        return f'<MessageTerm {self.term!r} message={self.message_id} for {self.user_id}>'
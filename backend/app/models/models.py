@@ -2,13 +2,18 @@ from app import db
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import event
-import base64
+from sqlalchemy.orm import load_only
 
-# Association table for followers
-followers = db.Table('followers',
-    db.Column('follower_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('followed_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
-)
+# User serialization profiles and the columns each one reads:
+# card for embedding (authors, members, senders), public for other users'
+# profiles and self for the logged-in user's own account.
+USER_PROFILE_COLUMNS = {
+    'card': ('id', 'username', 'profile_pic'),
+    'public': ('id', 'username', 'profile_pic', 'bio', 'created_at',
+               'follower_count', 'following_count', 'post_count'),
+    'self': ('id', 'username', 'profile_pic', 'bio', 'created_at',
+             'follower_count', 'following_count', 'post_count', 'email', 'theme'),
+}
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,6 +27,11 @@ class User(db.Model):
     theme = db.Column(db.String(20), default='light')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Denormalized counters, maintained on write (see counter events below)
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     posts = db.relationship('Post', backref='author', lazy='dynamic', cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='author', lazy='dynamic', cascade='all, delete-orphan')
@@ -29,13 +39,6 @@ class User(db.Model):
     sent_messages = db.relationship('Message', foreign_keys='Message.sender_id', backref='sender', lazy='dynamic', cascade='all, delete-orphan')
     received_messages = db.relationship('Message', foreign_keys='Message.recipient_id', backref='receiver', lazy='dynamic', cascade='all, delete-orphan')
     
-    # Self-referential many-to-many relationship for followers
-    followed = db.relationship(
-        'User', secondary=followers,
-        primaryjoin=(followers.c.follower_id == id),
-        secondaryjoin=(followers.c.followed_id == id),
-        backref=db.backref('followers', lazy='dynamic'), lazy='dynamic')
-    
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
@@ -44,24 +47,25 @@ class User(db.Model):
     
     def follow(self, user):
         if not self.is_following(user):
-            self.followed.append(user)
+            db.session.add(Follow(follower_id=self.id, following_id=user.id))
     
     def unfollow(self, user):
-        if self.is_following(user):
-            self.followed.remove(user)
+        follow = Follow.query.filter_by(follower_id=self.id, following_id=user.id).first()
+        if follow:
+            db.session.delete(follow)
     
     def is_following(self, user):
-        return self.followed.filter(
-            followers.c.followed_id == user.id).count() > 0
+        from app.services.follow_graph import is_following
+        return is_following(self.id, user.id)
     
     def get_follower_count(self):
-        return self.followers.count()
+        return self.follower_count or 0
     
     def get_following_count(self):
-        return self.followed.count()
+        return self.following_count or 0
     
     def get_post_count(self):
-        return self.posts.count()
+        return self.post_count or 0
     
     def update_last_seen(self):
         """Update user's last seen timestamp - placeholder"""
@@ -76,20 +80,37 @@ class User(db.Model):
         if len(username) < 3 or len(username) > 20:
             raise ValueError("Username must be between 3 and 20 characters")
     
-    def to_dict(self):
-        """Convert user object to dictionary - only user table data"""
-        return {
+    @classmethod
+    def load_profile(cls, profile):
+        """Loader option that fetches only the columns `profile` serializes"""
+        return load_only(*[getattr(cls, name) for name in USER_PROFILE_COLUMNS[profile]])
+    
+    def to_dict(self, profile='card'):
+        """Convert user object to dictionary using a serialization profile
+
+        Defaults to the card; only own-account endpoints pass 'self' (email, theme).
+        """
+        data = {
             'id': self.id,
             'username': self.username,
-            'email': self.email,
+            'profile_pic': self.profile_pic or 'default.jpg'
+        }
+        if profile == 'card':
+            return data
+        
+        data.update({
             'bio': self.bio or '',
-            'profile_pic': self.profile_pic or 'default.jpg',
-            'theme': self.theme or 'light',
             'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
             'followers': self.get_follower_count(),
             'following': self.get_following_count(),
             'posts': self.get_post_count()
-        }
+        })
+        if profile == 'self':
+            data.update({
+                'email': self.email,
+                'theme': self.theme or 'light'
+            })
+        return data
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -99,40 +120,58 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(500))  # For external URLs
-    image_data = db.Column(db.LargeBinary)  # For uploaded files
+    image_data = db.deferred(db.Column(db.LargeBinary))  # Legacy inline uploads, see migrate_post_images.py
+    image_key = db.Column(db.String(64))  # Blob store key (sha256) for uploaded files
     image_mimetype = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Keyset pagination walks (created_at, id) newest first
+    __table_args__ = (db.Index('ix_post_created_at_id', 'created_at', 'id'),)
     
     # Relationships
     comments = db.relationship('Comment', backref='post', lazy='dynamic', cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy='dynamic', cascade='all, delete-orphan')
     
     def get_like_count(self):
-        return self.likes.count()
+        return self.like_count or 0
     
     def get_comment_count(self):
-        return self.comments.count()
+        return self.comment_count or 0
     
     def is_liked_by(self, user):
         return self.likes.filter_by(user_id=user.id).first() is not None
     
-    def to_dict(self, current_user=None):
+    def get_image_path(self):
+        return f'/api/posts/{self.id}/image'
+    
+    def to_dict(self, current_user=None, author=None, is_liked=None):
+        """Convert post to dictionary
+        
+        `author` and `is_liked` may be precomputed for a whole page of posts
+        (see app.services.serializers) so no per-post queries run.
+        """
+        author = author or self.author
+        if is_liked is None:
+            is_liked = self.is_liked_by(current_user) if current_user else False
+        
         image = self.image_url
-        if self.image_data and self.image_mimetype:
-            encoded_data = base64.b64encode(self.image_data).decode('utf-8')
-            image = f'data:{self.image_mimetype};base64,{encoded_data}'
+        if self.image_mimetype:
+            # Uploaded images are served by GET /api/posts/<id>/image
+            image = self.get_image_path()
         return {
             'id': self.id,
             'content': self.content,
             'image': image,
             'image_url': image,  # For backward compatibility
             'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
-            'author': self.author.username,
-            'author_username': self.author.username,
+            'author': author.username,
+            'author_username': author.username,
             'likes': self.get_like_count(),
             'comments': self.get_comment_count(),
-            'is_liked': self.is_liked_by(current_user) if current_user else False
+            'is_liked': is_liked
         }
 
 
@@ -143,12 +182,17 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     
-    def to_dict(self):
+    # Comment threads and previews read (post_id, created_at, id) newest first
+    __table_args__ = (db.Index('ix_comment_post_created_id', 'post_id', 'created_at', 'id'),)
+    
+    def to_dict(self, author_data=None):
+        if author_data is None and self.author:
+            author_data = self.author.to_dict('card')
         return {
             'id': self.id,
             'content': self.content,
             'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
-            'author': self.author.to_dict() if self.author else None,
+            'author': author_data,
             'author_username': self.author.username if self.author else 'Unknown'
         }
 
@@ -171,8 +215,15 @@ class Follow(db.Model):
     following_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Ensure a user can't follow the same user multiple times
-    __table_args__ = (db.UniqueConstraint('follower_id', 'following_id', name='unique_follow'),)
+    # Ensure a user can't follow the same user multiple times; the unique key
+    # serves "who does X follow", the index the reverse "who follows X".
+    # Follower/following lists page through (user, created_at, id) newest first.
+    __table_args__ = (
+        db.UniqueConstraint('follower_id', 'following_id', name='unique_follow'),
+        db.Index('ix_follow_following_follower', 'following_id', 'follower_id'),
+        db.Index('ix_follow_following_created_id', 'following_id', 'created_at', 'id'),
+        db.Index('ix_follow_follower_created_id', 'follower_id', 'created_at', 'id'),
+    )
     
     def to_dict(self):
         """Convert follow object to dictionary for JSON response"""
@@ -197,30 +248,99 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     delete_after_24h = db.Column(db.Boolean, default=False)
     delete_after_viewing = db.Column(db.Boolean, default=False)
-    expires_at = db.Column(db.DateTime)  # Auto-set if delete_after_24h is True
+    expires_at = db.Column(db.DateTime, index=True)  # Set for delete_after_24h, and once a view-once message is read
     
     # Foreign keys
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id', ondelete='SET NULL'))
     
-    def to_dict(self):
-        return {
+    # History pages are a range scan over (conversation_id, created_at, id)
+    __table_args__ = (db.Index('ix_message_conversation_created_id', 'conversation_id', 'created_at', 'id'),)
+    
+    def to_dict(self, conversation=None, user_data=None, compact=False):
+        """Serialize the message.
+
+        conversation: the pair's summary, to derive is_read from its read watermarks
+            (without it the message reports unread).
+        user_data: already-serialized users by id, reused for sender and receiver.
+        compact: refer to sender and receiver by id instead of embedding them.
+        """
+        data = {
             'id': self.id,
             'content': self.content,
             'message_type': self.message_type,
             'media_url': self.media_url,
             'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
-            'is_read': self.is_read,
+            'is_read': conversation is not None and conversation.has_read(self.recipient_id, self.id),
             'delete_after_24h': self.delete_after_24h,
             'delete_after_viewing': self.delete_after_viewing,
-            'expires_at': self.expires_at.isoformat() + 'Z' if self.expires_at else None,
-            'sender': self.sender.to_dict() if self.sender else None,
-            'receiver': self.receiver.to_dict() if self.receiver else None
+            'expires_at': self.expires_at.isoformat() + 'Z' if self.expires_at else None
         }
+        if compact:
+            data['sender_id'] = self.sender_id
+            data['receiver_id'] = self.recipient_id
+            return data
+
+        user_data = user_data or {}
+        data['sender'] = user_data.get(self.sender_id) or (self.sender.to_dict('card') if self.sender else None)
+        data['receiver'] = user_data.get(self.recipient_id) or (self.receiver.to_dict('card') if self.receiver else None)
+        return data
     
     def __repr__(self):
         return f'<Message {self.sender.username} -> {self.receiver.username}: {self.content[:20] if self.content else self.message_type}...>'
 
+def _bump_counter(connection, table, row_id, column, delta):
+    connection.execute(
+        table.update()
+        .where(table.c.id == row_id)
+        .values({column: table.c[column] + delta})
+    )
+
+
+# Keep denormalized counters in step with inserts/deletes, inside the same flush
+@event.listens_for(Post, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    _bump_counter(connection, User.__table__, target.user_id, 'post_count', 1)
+
+
+@event.listens_for(Post, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    _bump_counter(connection, User.__table__, target.user_id, 'post_count', -1)
+
+
+@event.listens_for(Like, 'after_insert')
+def _like_inserted(mapper, connection, target):
+    _bump_counter(connection, Post.__table__, target.post_id, 'like_count', 1)
+
+
+@event.listens_for(Like, 'after_delete')
+def _like_deleted(mapper, connection, target):
+    _bump_counter(connection, Post.__table__, target.post_id, 'like_count', -1)
+
+
+@event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    _bump_counter(connection, Post.__table__, target.post_id, 'comment_count', 1)
+
+
+@event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    _bump_counter(connection, Post.__table__, target.post_id, 'comment_count', -1)
+
+
+@event.listens_for(Follow, 'after_insert')
+def _follow_inserted(mapper, connection, target):
+    _bump_counter(connection, User.__table__, target.follower_id, 'following_count', 1)
+    _bump_counter(connection, User.__table__, target.following_id, 'follower_count', 1)
+
+
+@event.listens_for(Follow, 'after_delete')
+def _follow_deleted(mapper, connection, target):
+    _bump_counter(connection, User.__table__, target.follower_id, 'following_count', -1)
+    _bump_counter(connection, User.__table__, target.following_id, 'follower_count', -1)
+
+
 # Association table for party members
 party_members = db.Table('party_members',
     db.Column('party_id', db.Integer, db.ForeignKey('party.id'), primary_key=True),
@@ -252,11 +372,7 @@ class Party(db.Model):
             'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
             'is_active': self.is_active,
             'members_count': len(self.members),
-            'members': [{
-                'id': member.id,
-                'username': member.username,
-                'profile_pic': member.profile_pic or 'default.jpg'
-            } for member in self.members]
+            'members': [member.to_dict('card') for member in self.members]
         }
 
     def __repr__(self):
@@ -17,7 +17,7 @@ class Note(db.Model):
     lyric_snippet = db.Column(db.String(500))  # Specific lyric/part of song
     timestamp = db.Column(db.String(20))  # Timestamp like "1:23" or "0:45"
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, index=True)  # swept by app/services/expiry.py
     
     # Relationship
     author = db.relationship('User', backref=db.backref('notes', lazy='dynamic'))
@@ -50,12 +50,3 @@ class Note(db.Model):
             'expires_at': self.expires_at.isoformat(),
             'is_expired': datetime.utcnow() > self.expires_at
         }
-    
-    @staticmethod
-    def cleanup_expired():
-        """Delete expired notes"""
-        expired_notes = Note.query.filter(Note.expires_at < datetime.utcnow()).all()
-        for note in expired_notes:
-            db.session.delete(note)
-        db.session.commit()
-        return len(expired_notes)
@@ -0,0 +1,25 @@
+"""Suggestion Model - precomputed "people you may know" rows per user"""
+from datetime import datetime
+from app import db
+
+
+class UserSuggestion(db.Model):
+    __tablename__ = 'user_suggestion'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    suggested_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    mutual_count = db.Column(db.Integer, nullable=False, default=0)  # followed users who follow them
+    shared_parties = db.Column(db.Integer, nullable=False, default=0)
+    messaged = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'suggested_id', name='unique_user_suggestion'),
+        # Reading a user's suggestions is a single range scan, best first
+        db.Index('ix_user_suggestion_user_score', 'user_id', 'score'),
+    )
+
+    def __repr__(self):
+        return f'<UserSuggestion {self.user_id} -> {self.suggested_id} ({self.score:.2f})>'
@@ -0,0 +1,23 @@
+"""Timeline Model - materialized per-user home timeline entries"""
+from datetime import datetime
+from app import db
+
+
+class TimelineEntry(db.Model):
+    __tablename__ = 'timeline_entry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)  # timeline owner
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # copied from the post
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='unique_timeline_entry'),
+        # A timeline page is a single range scan over this index
+        db.Index('ix_timeline_user_created_post', 'user_id', 'created_at', 'post_id'),
+        db.Index('ix_timeline_post_id', 'post_id'),
+    )
+
+    def __repr__(self):
+        return f'<TimelineEntry user={self.user_id} post={self.post_id}>'
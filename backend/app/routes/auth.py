@@ -74,7 +74,7 @@ def register():
         
         return jsonify({
             'message': 'User created successfully',
-            'user': user.to_dict()
+            'user': user.to_dict('self')
         }), 201
         
     except ValueError as e:
@@ -103,7 +103,7 @@ def login():
             
             return jsonify({
                 'message': 'Login successful',
-                'user': user.to_dict()
+                'user': user.to_dict('self')
             }), 200
         else:
             return jsonify({'message': 'Invalid username or password'}), 401
@@ -123,7 +123,7 @@ def get_current_user():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': user.to_dict('self')}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
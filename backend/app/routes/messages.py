@@ -1,7 +1,16 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app
 from functools import wraps
 from app import db
-from app.models import User, Message
+from app.models import User, Message, Conversation
+from app.services import conversations as conversation_service
+from app.services.pagination import decode_cursor, encode_cursor, get_page_args, keyset_page
+from app.services.user_cache import get_current_user, get_user, get_users
+from app.services.cache import USERS_SCOPE, get_response_cache
+from app.services.conditional import aggregate_row, conditional_get
+from app.services.expiry import claim_media_deletions
+from app.services.serializers import serialize_messages
+from app.services import delivery_queue, message_search, message_sync
+from sqlalchemy import func
 from datetime import datetime
 
 messages_bp = Blueprint('messages', __name__)
@@ -18,59 +27,65 @@ def login_required(f):
 def get_current_user_id():
     return session.get('user_id')
 
+def conversations_validator():
+    """The user's conversation count, newest activity and unread totals on both sides"""
+    aggregates = []
+    for side in conversation_service.participant_sides(get_current_user_id()):
+        aggregates += [
+            db.select(func.count(Conversation.id)).where(side),
+            db.select(func.max(Conversation.last_message_id)).where(side),
+            db.select(func.sum(Conversation.unread_a + Conversation.unread_b)).where(side)
+        ]
+    return aggregate_row(*aggregates) + [get_response_cache().generation(USERS_SCOPE)]
+
 @messages_bp.route('/messages/conversations', methods=['GET'])
 @login_required
+@conditional_get(conversations_validator)
 def get_conversations():
-    """Get all conversations for the current user"""
+    """Get the current user's inbox, most recent conversation first.
+
+    Served from the conversation summary table in one query plus one for the
+    partners. Passing `cursor` or `limit` switches to keyset pagination.
+    """
     try:
         user_id = get_current_user_id()
-        user = User.query.get(user_id)
+        user = get_current_user()
 
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get all users who have messaged with the current user
-        sent_to = db.session.query(Message.recipient_id).filter_by(sender_id=user_id).distinct()
-        received_from = db.session.query(Message.sender_id).filter_by(recipient_id=user_id).distinct()
+        paginated = 'cursor' in request.args or 'limit' in request.args
+        position = limit = None
+        if paginated:
+            try:
+                position, limit = get_page_args(
+                    request.args,
+                    current_app.config['CONVERSATIONS_PAGE_SIZE'],
+                    current_app.config['CONVERSATIONS_MAX_PAGE_SIZE']
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        rows, next_cursor = conversation_service.inbox_page(user_id, position, limit)
 
-        # Combine and get unique user IDs
-        user_ids = set()
-        for result in sent_to:
-            user_ids.add(result[0])
-        for result in received_from:
-            user_ids.add(result[0])
+        # Load every conversation partner in one query
+        partners = get_users([conversation.other_user_id(user_id) for conversation, _ in rows],
+                             User.load_profile('card'))
 
         conversations = []
-        for other_user_id in user_ids:
-            other_user = User.query.get(other_user_id)
+        for conversation, latest_message in rows:
+            other_user = partners.get(conversation.other_user_id(user_id))
             if other_user:
-                # Get the latest message between these users
-                latest_message = Message.query.filter(
-                    ((Message.sender_id == user_id) & (Message.recipient_id == other_user_id)) |
-                    ((Message.sender_id == other_user_id) & (Message.recipient_id == user_id))
-                ).order_by(Message.created_at.desc()).first()
-
-                # Count unread messages from this user
-                unread_count = Message.query.filter_by(
-                    sender_id=other_user_id,
-                    recipient_id=user_id,
-                    is_read=False
-                ).count()
-
                 conversations.append({
-                    'user': {
-                        'id': other_user.id,
-                        'username': other_user.username,
-                        'profile_pic': other_user.profile_pic or 'default.jpg'
-                    },
-                    'latest_message': latest_message.to_dict() if latest_message else None,
-                    'unread_count': unread_count
+                    'user': other_user.to_dict('card'),
+                    'latest_message': latest_message.to_dict(conversation) if latest_message else None,
+                    'unread_count': conversation.unread_for(user_id)
                 })
 
-        # Sort by latest message time
-        conversations.sort(key=lambda x: x['latest_message']['created_at'] if x['latest_message'] else '1970-01-01T00:00:00Z', reverse=True)
-
-        return jsonify({'conversations': conversations}), 200
+        payload = {'conversations': conversations}
+        if paginated:
+            payload['next_cursor'] = next_cursor
+        return jsonify(payload), 200
 
     except Exception as e:
         print(f"Error in get_conversations: {e}")
@@ -78,8 +93,80 @@ def get_conversations():
         traceback.print_exc()
         return jsonify({'error': 'Internal server error'}), 500
 
+@messages_bp.route('/messages/sync', methods=['GET'])
+@login_required
+def sync_messages():
+    """Everything that changed in the user's conversations since `since`.
+
+    Returns new messages (compact, with their participants), read watermark
+    moves and deleted message ids, plus the cursor to pass next time.
+    Without `since`, or with one older than the retained log, the response
+    has `reset` set: refetch the conversations, then sync from `cursor`.
+    """
+    try:
+        user_id = get_current_user_id()
+        since = request.args.get('since')
+        if since is None:
+            return jsonify({
+                'cursor': message_sync.latest_cursor(), 'has_more': False, 'reset': True,
+                'messages': [], 'participants': {}, 'reads': [], 'deleted': []
+            }), 200
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        return jsonify(message_sync.sync(user_id, since, current_app.config['MESSAGE_SYNC_MAX_EVENTS'])), 200
+
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        print(f"Error in sync_messages: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'Internal server error'}), 500
+
+@messages_bp.route('/messages/search', methods=['GET'])
+@login_required
+def search_messages():
+    """Search the current user's direct messages, newest first.
+
+    `q` holds words (all must match), `word*` prefixes and "quoted phrases";
+    pages continue with `cursor`.
+    """
+    try:
+        user_id = get_current_user_id()
+        query = request.args.get('q', '').strip()
+        try:
+            position, limit = get_page_args(
+                request.args,
+                current_app.config['MESSAGE_SEARCH_PAGE_SIZE'],
+                current_app.config['MESSAGE_SEARCH_MAX_PAGE_SIZE']
+            )
+            terms, phrases = message_search.parse_query(
+                query,
+                current_app.config['MESSAGE_SEARCH_MAX_TERMS'],
+                current_app.config['MESSAGE_SEARCH_MIN_PREFIX']
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        messages, next_cursor = message_search.search(user_id, terms, phrases, position, limit)
+
+        conversation_ids = {message.conversation_id for message in messages}
+        conversations = {conversation.id: conversation for conversation in
+                         Conversation.query.filter(Conversation.id.in_(conversation_ids))} if conversation_ids else {}
+        messages_data, _ = serialize_messages(messages, conversations=conversations)
+
+        return jsonify({
+            'messages': messages_data,
+            'query': query,
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        print(f"Error in search_messages: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'Internal server error'}), 500
 
 @messages_bp.route('/messages/<int:user_id>', methods=['GET'])
 @login_required
@@ -87,34 +174,65 @@ def get_messages(user_id):
     """Get all messages between current user and specified user"""
     try:
         current_user_id = get_current_user_id()
-        current_user = User.query.get(current_user_id)
-        other_user = User.query.get(user_id)
+        current_user = get_current_user()
+        other_user = get_user(user_id)
 
         if not current_user or not other_user:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get all messages between these users
-        messages = Message.query.filter(
-            ((Message.sender_id == current_user_id) & (Message.recipient_id == user_id)) |
-            ((Message.sender_id == user_id) & (Message.recipient_id == current_user_id))
-        ).order_by(Message.created_at.asc()).all()
-
-        # Mark messages from the other user as read
-        Message.query.filter_by(
-            sender_id=user_id,
-            recipient_id=current_user_id,
-            is_read=False
-        ).update({'is_read': True})
-        db.session.commit()
-
-        return jsonify({
-            'messages': [message.to_dict() for message in messages],
-            'other_user': {
-                'id': other_user.id,
-                'username': other_user.username,
-                'profile_pic': other_user.profile_pic or 'default.jpg'
+        # Passing `before`, `after` or `limit` switches to fixed-size pages
+        paginated = any(arg in request.args for arg in ('before', 'after', 'limit'))
+        position = limit = None
+        if paginated:
+            try:
+                cursor = request.args.get('after') or request.args.get('before')
+                position = decode_cursor(cursor) if cursor else None
+                limit = request.args.get('limit', current_app.config['MESSAGES_PAGE_SIZE'], type=int)
+                limit = max(1, min(limit or 1, current_app.config['MESSAGES_MAX_PAGE_SIZE']))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        # History is a range scan over (conversation_id, created_at, id)
+        conversation = conversation_service.find_conversation(current_user_id, user_id)
+        messages = []
+        before_cursor = None
+        if conversation:
+            query = Message.query.filter(Message.conversation_id == conversation.id)
+            if not paginated:
+                messages = query.order_by(Message.created_at.asc(), Message.id.asc()).all()
+            elif 'after' in request.args:
+                # Newer messages, oldest first, e.g. to catch up after reconnecting
+                messages, _ = keyset_page(
+                    query, Message.created_at, Message.id, position, limit, newest_first=False
+                )
+            else:
+                # The newest page, or the page older than `before`; shown oldest first
+                messages, before_cursor = keyset_page(query, Message.created_at, Message.id, position, limit)
+                messages.reverse()
+
+        # Opening the chat moves the read watermark to its latest message
+        if conversation:
+            conversation_service.mark_read(current_user_id, user_id)
+
+        # Serialize before committing so the page is not reloaded row by row;
+        # `format=compact` lists the two participants once and messages refer to them by id
+        compact = request.args.get('format') == 'compact'
+        messages_data, participants = serialize_messages(messages, conversation, compact=compact)
+        payload = {
+            'messages': messages_data,
+            'other_user': participants.get(user_id) or other_user.to_dict('card')
+        }
+        if compact:
+            payload['participants'] = {
+                str(participant_id): data for participant_id, data in participants.items()
             }
-        }), 200
+        if paginated:
+            # `before_cursor` pages further back; `after_cursor` polls for newer messages
+            payload['before_cursor'] = before_cursor
+            payload['after_cursor'] = encode_cursor(messages[-1].created_at, messages[-1].id) \
+                if messages else request.args.get('after')
+        db.session.commit()
+        return jsonify(payload), 200
 
     except Exception as e:
         print(f"Error in get_messages: {e}")
@@ -181,11 +299,14 @@ def send_message():
         )
 
         db.session.add(message)
+        conversation = conversation_service.record_message(message)
+        # Held until the recipient's socket acknowledges it (see app/socket_events.py)
+        delivery_queue.enqueue(message)
         db.session.commit()
 
         return jsonify({
             'message': 'Message sent successfully',
-            'message_data': message.to_dict()
+            'message_data': message.to_dict(conversation)
         }), 201
 
     except Exception as e:
@@ -210,8 +331,8 @@ def mark_message_read(message_id):
         if message.recipient_id != current_user_id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        # Mark as read
-        message.is_read = True
+        # Mark it and everything before it as read
+        conversation_service.mark_read_up_to(current_user_id, message.sender_id, message.id)
         db.session.commit()
         
         return jsonify({'message': 'Message marked as read'}), 200
@@ -235,15 +356,17 @@ def get_shared_media(user_id):
         twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
         
         # Get all media messages between these users from last 24 hours
+        conversation = conversation_service.find_conversation(current_user_id, user_id)
+        if not conversation:
+            return jsonify({'media': []}), 200
         media_messages = Message.query.filter(
-            ((Message.sender_id == current_user_id) & (Message.recipient_id == user_id)) |
-            ((Message.sender_id == user_id) & (Message.recipient_id == current_user_id)),
+            Message.conversation_id == conversation.id,
             Message.message_type.in_(['image', 'audio']),
             Message.created_at >= twenty_four_hours_ago
         ).order_by(Message.created_at.desc()).all()
 
         return jsonify({
-            'media': [msg.to_dict() for msg in media_messages]
+            'media': serialize_messages(media_messages, conversation)[0]
         }), 200
 
     except Exception as e:
@@ -255,24 +378,18 @@ def get_shared_media(user_id):
 @messages_bp.route('/messages/cleanup-expired', methods=['POST'])
 @login_required
 def cleanup_expired_messages():
-    """Delete messages that have expired (past 24h with delete_after_24h enabled)"""
+    """Hand the current user's swept media paths to the client.
+
+    Expired messages are deleted by the expiry sweeper; this only drains the
+    user's queued media paths so the client can delete them from Supabase.
+    """
     try:
-        # Find all expired messages
-        expired_messages = Message.query.filter(
-            Message.delete_after_24h == True,
-            Message.expires_at <= datetime.utcnow()
-        ).all()
-        
-        media_paths = [msg.media_path for msg in expired_messages if msg.media_path]
-        
-        for message in expired_messages:
-            db.session.delete(message)
-        
+        media_paths = claim_media_deletions(get_current_user_id())
         db.session.commit()
         
         return jsonify({
-            'message': f'Deleted {len(expired_messages)} expired messages',
-            'count': len(expired_messages),
+            'message': f'Claimed {len(media_paths)} expired media files',
+            'count': len(media_paths),
             'media_paths': media_paths  # Return paths for frontend to delete from Supabase
         }), 200
 
@@ -4,6 +4,10 @@ from datetime import datetime
 from app import db
 from app.models.note import Note
 from app.services.spotify_service import SpotifyService
+from app.services.cache import USERS_SCOPE, get_response_cache
+from app.services.conditional import aggregate_row, conditional_get
+from app.services.expiry import get_expiry_sweeper
+from sqlalchemy import func
 
 notes_bp = Blueprint('notes', __name__)
 
@@ -15,14 +19,20 @@ def get_current_user_id():
     """Get current user ID from session"""
     return session.get('user_id')
 
+def notes_validator():
+    """Active note count and newest note; author edits bump the cache generation"""
+    active = Note.expires_at > datetime.utcnow()
+    return aggregate_row(
+        db.select(func.count(Note.id)).where(active),
+        db.select(func.max(Note.id)).where(active)
+    ) + [get_response_cache().generation(USERS_SCOPE)]
+
 @notes_bp.route('/api/notes', methods=['GET'])
+@conditional_get(notes_validator)
 def get_notes():
     """Get all active notes (not expired)"""
     try:
-        # Cleanup expired notes first
-        Note.cleanup_expired()
-        
-        # Get active notes
+        # Expired notes are filtered here and deleted by the expiry sweeper
         notes = Note.query.filter(
             Note.expires_at > datetime.utcnow()
         ).order_by(Note.created_at.desc()).all()
@@ -133,7 +143,7 @@ def get_track_preview(track_id):
 def cleanup_notes():
     """Manually trigger cleanup of expired notes"""
     try:
-        count = Note.cleanup_expired()
+        count = get_expiry_sweeper().sweep_notes()
         return jsonify({
             'message': f'Cleaned up {count} expired notes'
         }), 200
@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify, session
 from functools import wraps
 from app import db
 from app.models import User, Party, PartyMessage, PartyJoinRequest
+from app.models.models import party_members
+from app.services.cache import USERS_SCOPE, get_response_cache
+from app.services.conditional import aggregate_row, conditional_get
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 import re
 
@@ -34,8 +38,18 @@ def extract_youtube_video_id(url):
             return match.group(1)
     return None
 
+def parties_validator():
+    """Active parties and membership churn; member edits bump the cache generation"""
+    return aggregate_row(
+        db.select(func.count(Party.id)).where(Party.is_active == True),
+        db.select(func.max(Party.id)),
+        db.select(func.count()).select_from(party_members),
+        db.select(func.max(party_members.c.joined_at))
+    ) + [get_response_cache().generation(USERS_SCOPE)]
+
 @parties_bp.route('/parties', methods=['GET'])
 @login_required
+@conditional_get(parties_validator)
 def get_parties():
     """Get all active parties"""
     try:
@@ -250,7 +264,7 @@ def join_party(party_id):
         socketio.emit('party_joined', {
             'party_id': party_id,
             'user_id': user_id,
-            'members': [member.to_dict() for member in party.members]
+            'members': [member.to_dict('card') for member in party.members]
         }, room=str(party_id))
 
         return jsonify({
@@ -451,7 +465,7 @@ def handle_join_request(party_id, request_id):
                 socketio.emit('party_joined', {
                     'party_id': party_id,
                     'user_id': join_request.user_id,
-                    'members': [member.to_dict() for member in party.members]
+                    'members': [member.to_dict('card') for member in party.members]
                 }, room=str(party_id))
         else:
             join_request.status = 'rejected'
@@ -504,7 +518,7 @@ def add_member_to_party(party_id):
         socketio.emit('party_joined', {
             'party_id': party_id,
             'user_id': member_user_id,
-            'members': [m.to_dict() for m in party.members]
+            'members': [m.to_dict('card') for m in party.members]
         }, room=str(party_id))
 
         return jsonify({
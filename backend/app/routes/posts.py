@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, session
 from functools import wraps
 from app import db
 from app.models import Post, User, Like, Comment
+from app.services.serializers import serialize_posts
 
 posts_bp = Blueprint('posts', __name__)
 
@@ -34,7 +35,7 @@ def get_posts():
             current_user = User.query.get(user_id)
         
         return jsonify({
-            'posts': [post.to_dict(current_user) for post in posts.items],
+            'posts': serialize_posts(posts.items, viewer=current_user),
             'total': posts.total,
             'pages': posts.pages,
             'current_page': page
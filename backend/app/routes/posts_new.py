@@ -1,8 +1,18 @@
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, request, jsonify, session, current_app, send_file
 from functools import wraps
 from app import db
-from app.models import Post, User, Like, Comment
+from app.models import Post, User, Like, Comment, PostImageVariant
+from app.services.feed_service import visible_posts_query
+from app.services.pagination import get_page_args, keyset_page
+from app.services import timeline_service
+from app.services.serializers import serialize_posts, serialize_comments
+from app.services.blob_store import BlobStore, get_blob_store
+from app.services import image_pipeline
+from app.services.cache import POSTS_SCOPE, author_scope, get_response_cache, user_scope, viewer_key
+from app.services.conditional import conditional_get
+from app.services.user_cache import get_current_user
 from datetime import datetime
+import io
 import os
 import time
 import base64
@@ -22,51 +32,89 @@ def login_required(f):
 def get_current_user_id():
     return session.get('user_id')
 
+def feed_scopes(user_id, following_feed=False):
+    """Cache scopes of a viewer's home feed.
+
+    Followed large authors are never fanned out, so their author scopes are
+    folded in here just as their posts are merged at read time. The full feed
+    also shows public authors the viewer does not follow.
+    """
+    scopes = [user_scope(user_id)]
+    scopes += [author_scope(author_id) for author_id in timeline_service.large_followed_ids(user_id)]
+    if not following_feed:
+        scopes.append(POSTS_SCOPE)
+    return tuple(scopes)
+
+
+def feed_validator():
+    """Generations of the viewer's feed scopes, plus the response cache TTL bucket.
+
+    Writes that change what the viewer's feed shows bump one of its scopes.
+    Engagement counts on other people's posts are allowed to lag by up to the
+    cache TTL, so the bucket caps how long a 304 can keep them stale.
+    """
+    cache = get_response_cache()
+    scopes = feed_scopes(get_current_user_id(), request.args.get('feed') == 'following')
+    return [cache.generation(scope) for scope in scopes] + [int(time.time() // max(cache.ttl, 1))]
+
 
 @posts_bp.route('/posts', methods=['GET'])
 @login_required
+@conditional_get(feed_validator)
 def get_posts():
-    """Get all posts (feed)"""
+    """Get the home feed.
+
+    Passing `cursor` or `limit` switches to keyset pagination: one page of
+    posts is returned together with a `next_cursor` for the following page.
+    `feed=following` reads the user's materialized timeline instead (always
+    paginated).
+    """
     try:
         user_id = get_current_user_id()
-        user = User.query.get(user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get all posts, but respect privacy settings
-        all_posts = Post.query.order_by(Post.created_at.desc()).all()
-        
-        # Filter posts based on privacy
-        posts = []
-        for post in all_posts:
-            post_author = post.author
-            # Show post if:
-            # 1. It's the user's own post, or
-            # 2. The author's profile is not private, or  
-            # 3. The current user follows the author
-            if (post.user_id == user_id or 
-                not post_author.is_private or 
-                user.is_following(post_author)):
-                posts.append(post)
-        
-        # Convert posts to dict and add like status for current user
-        posts_data = []
-        for post in posts:
-            post_dict = post.to_dict()
-            post_dict['is_liked'] = post.is_liked_by(user)
-            post_dict['author'] = post.author.to_dict()  # Include full author info
+        following_feed = request.args.get('feed') == 'following'
+        paginated = following_feed or 'cursor' in request.args or 'limit' in request.args
+        position = limit = None
+        if paginated:
+            try:
+                position, limit = get_page_args(
+                    request.args,
+                    current_app.config['FEED_PAGE_SIZE'],
+                    current_app.config['FEED_MAX_PAGE_SIZE']
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        def build_feed():
+            next_cursor = None
+            if following_feed:
+                posts, next_cursor = timeline_service.read_timeline(user_id, position, limit)
+            else:
+                # Privacy (own posts, public authors, followed authors) is applied in SQL
+                query = visible_posts_query(user_id)
+                if paginated:
+                    posts, next_cursor = keyset_page(query, Post.created_at, Post.id, position, limit)
+                else:
+                    posts = query.order_by(Post.created_at.desc(), Post.id.desc()).all()
             
-            # Include comments in feed
-            comments = Comment.query.filter_by(post_id=post.id)\
-                                   .order_by(Comment.created_at.asc())\
-                                   .options(db.joinedload(Comment.author))\
-                                   .all()
-            post_dict['comments_list'] = [comment.to_dict() for comment in comments]
+            # Counts, like flags, authors and comments for the whole page at once
+            posts_data = serialize_posts(
+                posts, viewer=user, author_detail=True,
+                comment_preview=current_app.config['FEED_COMMENT_PREVIEW'],
+                image_width=request.args.get('image_width', type=int)
+            )
             
-            posts_data.append(post_dict)
+            if paginated:
+                return {'posts': posts_data, 'next_cursor': next_cursor}
+            return {'posts': posts_data}
         
-        return jsonify({'posts': posts_data}), 200
+        # The full feed also shows public authors the viewer does not follow
+        payload = get_response_cache().get_or_compute(feed_scopes(user_id, following_feed), viewer_key(user_id, request.args, 'home'), build_feed)
+        return jsonify(payload), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -90,6 +138,7 @@ def create_post():
         
         image_url = None
         image_data = None
+        image_key = None
         image_mimetype = None
         
         # Check if image file is uploaded
@@ -118,10 +167,13 @@ def create_post():
         if image_url and image_data:
             return jsonify({'error': 'Cannot provide both image file and image URL'}), 400
         
+        if image_data:
+            image_key = get_blob_store().put(image_data)
+        
         post = Post(
             content=content,
             image_url=image_url,
-            image_data=image_data,
+            image_key=image_key,
             image_mimetype=image_mimetype,
             user_id=user_id
         )
@@ -129,6 +181,11 @@ def create_post():
         db.session.add(post)
         db.session.commit()
         
+        # Push the post onto followers' timelines off the request thread
+        timeline_service.schedule_fan_out(post.id)
+        if image_key:
+            image_pipeline.schedule_post_variants(post.id)
+        
         return jsonify({
             'message': 'Post created successfully',
             'post': post.to_dict()
@@ -155,12 +212,14 @@ def get_post(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        post_dict = post.to_dict()
-        post_dict['is_liked'] = post.is_liked_by(user)
+        post_dict = serialize_posts([post], viewer=user)[0]
         
         # Get comments
-        comments = Comment.query.filter_by(post_id=post_id).order_by(Comment.created_at.asc()).all()
-        post_dict['comments'] = [comment.to_dict() for comment in comments]
+        comments = Comment.query.filter_by(post_id=post_id)\
+                               .order_by(Comment.created_at.asc(), Comment.id.asc())\
+                               .options(db.joinedload(Comment.author))\
+                               .all()
+        post_dict['comments'] = serialize_comments(comments)
         
         return jsonify({'post': post_dict}), 200
         
@@ -168,6 +227,60 @@ def get_post(post_id):
         return jsonify({'error': str(e)}), 500
 
 
+@posts_bp.route('/posts/<int:post_id>/image', methods=['GET'])
+@login_required
+def get_post_image(post_id):
+    """Serve an uploaded post image with ETag, Last-Modified and Range support
+    
+    `variant` selects a resized WebP rendition (thumb, feed, full); the
+    original upload is served until the variant has been generated.
+    """
+    try:
+        post = visible_posts_query(get_current_user_id()).filter(Post.id == post_id).first()
+        
+        if not post or not post.image_mimetype:
+            return jsonify({'error': 'Image not found'}), 404
+        
+        max_age = current_app.config['MEDIA_CACHE_MAX_AGE']
+        variant_name = request.args.get('variant')
+        if variant_name:
+            variant = PostImageVariant.query.filter_by(post_id=post_id, name=variant_name).first()
+            if variant:
+                return send_file(
+                    get_blob_store().path(variant.blob_key),
+                    mimetype=variant.mimetype,
+                    conditional=True,
+                    etag=variant.blob_key,
+                    last_modified=post.created_at,
+                    max_age=max_age
+                )
+        
+        if post.image_key:
+            return send_file(
+                get_blob_store().path(post.image_key),
+                mimetype=post.image_mimetype,
+                conditional=True,
+                etag=post.image_key,
+                last_modified=post.created_at,
+                max_age=max_age
+            )
+        
+        # Rows not yet moved by migrate_post_images.py still carry inline bytes
+        if not post.image_data:
+            return jsonify({'error': 'Image not found'}), 404
+        return send_file(
+            io.BytesIO(post.image_data),
+            mimetype=post.image_mimetype,
+            conditional=True,
+            etag=BlobStore.key_for(post.image_data),
+            last_modified=post.created_at,
+            max_age=max_age
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @posts_bp.route('/posts/<int:post_id>', methods=['DELETE'])
 @login_required
 def delete_post(post_id):
@@ -182,6 +295,7 @@ def delete_post(post_id):
         if post.user_id != user_id:
             return jsonify({'error': 'Unauthorized to delete this post'}), 403
         
+        timeline_service.remove_post(post.id)
         db.session.delete(post)
         db.session.commit()
         
@@ -235,6 +349,37 @@ def like_post(post_id):
         return jsonify({'error': f'Failed to like/unlike post: {str(e)}'}), 500
 
 
+@posts_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
+@login_required
+def get_comments(post_id):
+    """Get a post's comment thread, newest first, one cursor page at a time"""
+    try:
+        post = visible_posts_query(get_current_user_id()).filter(Post.id == post_id).first()
+        
+        if not post:
+            return jsonify({'error': 'Post not found'}), 404
+        
+        try:
+            position, limit = get_page_args(
+                request.args,
+                current_app.config['COMMENTS_PAGE_SIZE'],
+                current_app.config['COMMENTS_MAX_PAGE_SIZE']
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        query = Comment.query.filter_by(post_id=post_id).options(db.joinedload(Comment.author))
+        comments, next_cursor = keyset_page(query, Comment.created_at, Comment.id, position, limit)
+        
+        return jsonify({
+            'comments': serialize_comments(comments),
+            'next_cursor': next_cursor
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @posts_bp.route('/posts/<int:post_id>/comments', methods=['POST'])
 @login_required
 def add_comment(post_id):
@@ -317,17 +462,13 @@ def get_user_posts(user_id):
         
         # No privacy check - all profiles are public
         current_user = User.query.get(current_user_id)
-        posts = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc()).all()
         
-        # Convert posts to dict and add like status for current user
-        posts_data = []
-        for post in posts:
-            post_dict = post.to_dict()
-            post_dict['is_liked'] = post.is_liked_by(current_user)
-            post_dict['author'] = target_user.to_dict()  # Include full author info
-            posts_data.append(post_dict)
+        def build_posts():
+            posts = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc()).all()
+            return {'posts': serialize_posts(posts, viewer=current_user, author_detail=True)}
         
-        return jsonify({'posts': posts_data}), 200
+        cache_key = viewer_key(current_user_id, request.args, 'user_posts', user_id)
+        return jsonify(get_response_cache().get_or_compute(user_scope(user_id), cache_key, build_posts)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
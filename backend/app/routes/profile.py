@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, request, jsonify, session, current_app, send_file
 from functools import wraps
 from app import db
 from app.models import User
+from app.services.avatars import store_avatar, find_variant, profile_pic_value
+from app.services.blob_store import get_blob_store
 from datetime import datetime
 import os
 import time
@@ -33,7 +35,7 @@ def get_profile():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify(user.to_dict()), 200
+        return jsonify(user.to_dict('self')), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -95,7 +97,10 @@ def update_profile():
         if 'bio' in data:
             user.bio = data['bio']
         if 'profile_pic' in data:
-            user.profile_pic = data['profile_pic']
+            try:
+                user.profile_pic = profile_pic_value(data['profile_pic'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         if 'is_private' in data:
             user.is_private = data['is_private']
         if 'theme' in data:
@@ -105,7 +110,7 @@ def update_profile():
         
         return jsonify({
             'message': 'Profile updated successfully',
-            'user': user.to_dict()
+            'user': user.to_dict('self')
         }), 200
         
     except Exception as e:
@@ -222,7 +227,10 @@ def update_comprehensive_profile():
         if 'bio' in data:
             user.bio = data['bio']
         if 'profile_pic' in data:
-            user.profile_pic = data['profile_pic']
+            try:
+                user.profile_pic = profile_pic_value(data['profile_pic'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
 
         # Accept both explicit boolean and privacy_settings map from frontend
         if 'is_private' in data:
@@ -246,7 +254,7 @@ def update_comprehensive_profile():
         
         return jsonify({
             'message': 'Profile updated successfully',
-            'profile': user.to_dict()
+            'profile': user.to_dict('self')
         }), 200
         
     except Exception as e:
@@ -265,7 +273,7 @@ def get_detailed_profile():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify(user.to_dict()), 200
+        return jsonify(user.to_dict('self')), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -274,7 +282,7 @@ def get_detailed_profile():
 @profile_bp.route('/profile/avatar', methods=['POST'])
 @login_required
 def upload_avatar():
-    """Upload avatar image file and store as base64 data-URI in profile_pic column."""
+    """Upload avatar image file into the blob store; profile_pic keeps only its URL."""
     import traceback
     try:
         user_id = get_current_user_id()
@@ -302,10 +310,8 @@ def upload_avatar():
         if len(data) > max_bytes:
             return jsonify({'error': 'File too large (max 5MB)'}), 400
 
-        # Store the image as a base64 data-URI in the profile_pic column
-        import base64
-        b64 = base64.b64encode(data).decode('ascii')
-        data_uri = f"data:{file.mimetype};base64,{b64}"
+        # Store the original and its 32/64/256px variants as files
+        avatar_path = store_avatar(data)
 
         # Before overwriting, if previous profile_pic pointed to a local static file, remove it
         try:
@@ -322,11 +328,11 @@ def upload_avatar():
         except Exception:
             pass
 
-        # Save new data-uri into profile_pic
-        user.profile_pic = data_uri
+        # Save the short avatar URL into profile_pic
+        user.profile_pic = avatar_path
         db.session.commit()
 
-        return jsonify({'message': 'Avatar uploaded successfully', 'profile_pic': data_uri}), 200
+        return jsonify({'message': 'Avatar uploaded successfully', 'profile_pic': avatar_path}), 200
 
     except Exception as e:
         db.session.rollback()
@@ -336,6 +342,31 @@ def upload_avatar():
 
 
 
+@profile_bp.route('/avatars/<avatar_key>', methods=['GET'])
+def get_avatar_image(avatar_key):
+    """Serve an avatar variant; `size` picks the smallest stored size that fits.
+    
+    Avatar URLs are content-addressed, so responses are cacheable forever.
+    """
+    try:
+        variant = find_variant(avatar_key, request.args.get('size', type=int))
+        if not variant:
+            return jsonify({'error': 'Avatar not found'}), 404
+
+        response = send_file(
+            get_blob_store().path(variant.blob_key),
+            mimetype=variant.mimetype,
+            conditional=True,
+            etag=variant.blob_key,
+            max_age=current_app.config['AVATAR_CACHE_MAX_AGE']
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @profile_bp.route('/profile/avatar/<int:user_id>', methods=['GET'])
 def serve_avatar(user_id):
     """Serve avatar - returns profile_pic URL/data-URI"""
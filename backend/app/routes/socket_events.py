@@ -2,6 +2,7 @@ from flask_socketio import emit, join_room, leave_room
 from flask import request
 from app import socketio, db
 from app.models import User, Message, Party, PartyMessage
+from app.services import conversations as conversation_service
 from datetime import datetime
 import json
 
@@ -73,6 +74,7 @@ def handle_send_message(data):
         )
 
         db.session.add(message)
+        conversation_service.record_message(message)
         db.session.commit()
 
         # Prepare message data
@@ -93,45 +95,10 @@ def handle_send_message(data):
         print(f'Message sent from {sender_id} to {recipient_id}')
 
     except Exception as e:
+        db.session.rollback()
         print(f'Error sending message: {e}')
         emit('error', {'message': 'Failed to send message'})
 
-@socketio.on('mark_as_read')
-def handle_mark_as_read(data):
-    """Mark messages as read"""
-    try:
-        message_id = data.get('message_id')
-        user_id = data.get('user_id')
-
-        if not message_id or not user_id:
-            emit('error', {'message': 'Missing required fields'})
-            return
-
-        message = Message.query.get(message_id)
-        if not message:
-            emit('error', {'message': 'Message not found'})
-            return
-
-        # Only recipient can mark as read
-        if message.recipient_id != user_id:
-            emit('error', {'message': 'Unauthorized'})
-            return
-
-        message.is_read = True
-        db.session.commit()
-
-        # Notify sender that message was read
-        emit('message_read', {
-            'message_id': message_id,
-            'reader_id': user_id
-        }, room=str(message.sender_id))
-
-        print(f'Message {message_id} marked as read by {user_id}')
-
-    except Exception as e:
-        print(f'Error marking message as read: {e}')
-        emit('error', {'message': 'Failed to mark message as read'})
-
 @socketio.on('video_state_change')
 def handle_video_state_change(data):
     """Handle video playback synchronization (admin only)"""
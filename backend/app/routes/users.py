@@ -1,8 +1,19 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app
 from functools import wraps
 from app import db
 from app.models import User, Post, Follow, Comment
+from app.services import timeline_service
+from app.services.avatars import profile_pic_value
+from app.services.serializers import serialize_posts
+from app.services.cache import get_response_cache, user_scope, viewer_key
+from app.services.conditional import conditional_get
+from app.services.follow_graph import get_follow_graph, is_following as graph_is_following
+from app.services.pagination import get_page_args, keyset_page
+from app.services.search_index import get_search_index
+from app.services.suggestions import get_suggestions
+from app.services.user_cache import get_current_user, get_users
 from sqlalchemy import func
+from sqlalchemy.orm import load_only
 
 users_bp = Blueprint('users', __name__)
 
@@ -32,7 +43,7 @@ def get_current_user_profile():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': user.to_dict('self')}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -89,7 +100,10 @@ def update_profile():
         if 'bio' in data:
             user.bio = data['bio']
         if 'profile_pic' in data:
-            user.profile_pic = data['profile_pic']
+            try:
+                user.profile_pic = profile_pic_value(data['profile_pic'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         if 'is_private' in data:
             user.is_private = data['is_private']
         if 'theme' in data:
@@ -99,7 +113,7 @@ def update_profile():
         
         return jsonify({
             'message': 'Profile updated successfully',
-            'user': user.to_dict()
+            'user': user.to_dict('self')
         }), 200
         
     except Exception as e:
@@ -111,7 +125,7 @@ def update_profile():
 def get_user_profile(user_id):
     try:
         user = User.query.get_or_404(user_id)
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': user.to_dict('public')}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -129,11 +143,11 @@ def get_user_posts(user_id):
         ).paginate(page=page, per_page=per_page, error_out=False)
         
         return jsonify({
-            'posts': [post.to_dict() for post in posts.items],
+            'posts': serialize_posts(posts.items),
             'total': posts.total,
             'pages': posts.pages,
             'current_page': page,
-            'user': user.to_dict()
+            'user': user.to_dict('public')
         }), 200
         
     except Exception as e:
@@ -156,6 +170,7 @@ def follow_user(user_id):
             return jsonify({'error': 'Already following this user'}), 400
         
         current_user.follow(user_to_follow)
+        timeline_service.backfill_author(current_user_id, user_id)
         db.session.commit()
         
         return jsonify({
@@ -181,6 +196,7 @@ def unfollow_user(user_id):
             return jsonify({'error': 'Not following this user'}), 400
         
         current_user.unfollow(user_to_unfollow)
+        timeline_service.remove_author(current_user_id, user_id)
         db.session.commit()
         
         return jsonify({
@@ -201,19 +217,20 @@ def search_users():
         if not query:
             return jsonify({'users': []}), 200
         
-        users = User.query.filter(
-            User.username.contains(query)
-        ).limit(20).all()
+        # Ranked ids from the in-memory index; followed users rank higher for a logged-in viewer
+        viewer_id = get_current_user_id()
+        followed = None
+        if viewer_id:
+            followed = lambda ids: get_follow_graph().following_flags(viewer_id, ids)
+        user_ids = get_search_index().search(query, limit=20, followed=followed)
+        
+        users_by_id = get_users(user_ids, load_only(User.id, User.username, User.profile_pic, User.bio))
+        users = [users_by_id[user_id] for user_id in user_ids if user_id in users_by_id]
         
         # Return user data without follower counts to avoid authentication issues
         user_data = []
         for user in users:
-            user_data.append({
-                'id': user.id,
-                'username': user.username,
-                'profile_pic': user.profile_pic or 'default.jpg',
-                'bio': user.bio or ''
-            })
+            user_data.append(dict(user.to_dict('card'), bio=user.bio or ''))
         
         return jsonify({
             'users': user_data,
@@ -224,6 +241,42 @@ def search_users():
         return jsonify({'error': str(e)}), 500
 
 
+@users_bp.route('/users/batch', methods=['GET'])
+@login_required
+def get_users_batch():
+    """Compact cards for many users at once: ?ids=1,2,3 (or repeated ids=)"""
+    try:
+        raw_ids = [part for value in request.args.getlist('ids') for part in value.split(',') if part.strip()]
+        try:
+            user_ids = list(dict.fromkeys(int(part) for part in raw_ids))
+        except ValueError:
+            return jsonify({'error': 'ids must be integers'}), 400
+        
+        max_ids = current_app.config['USERS_BATCH_MAX_IDS']
+        if len(user_ids) > max_ids:
+            return jsonify({'error': f'At most {max_ids} ids per request'}), 400
+        
+        users = get_users(user_ids, User.load_profile('card'))
+        return jsonify({
+            'users': [users[user_id].to_dict('card') for user_id in user_ids if user_id in users]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@users_bp.route('/users/suggestions', methods=['GET'])
+@login_required
+def get_user_suggestions():
+    """People the current user may know, precomputed by compute_suggestions.py"""
+    try:
+        limit = max(1, min(request.args.get('limit', 10, type=int) or 10, 50))
+        return jsonify({'users': get_suggestions(get_current_user_id(), limit)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @users_bp.route('/users/<username>', methods=['GET'])
 @login_required
 def get_user_by_username(username):
@@ -239,22 +292,14 @@ def get_user_by_username(username):
         # Check if current user is following this user
         is_following = False
         if current_user_id != user.id:
-            follow = Follow.query.filter_by(
-                follower_id=current_user_id,
-                following_id=user.id
-            ).first()
-            is_following = follow is not None
+            is_following = graph_is_following(current_user_id, user.id)
         
-        # Get user stats
-        followers_count = Follow.query.filter_by(following_id=user.id).count()
-        following_count = Follow.query.filter_by(follower_id=user.id).count()
-        posts_count = Post.query.filter_by(user_id=user.id).count()
-        
-        user_data = user.to_dict()
+        # Stats come from the denormalized counters
+        user_data = user.to_dict('self' if current_user_id == user.id else 'public')
         user_data.update({
-            'followers_count': followers_count,
-            'following_count': following_count,
-            'posts_count': posts_count
+            'followers_count': user.get_follower_count(),
+            'following_count': user.get_following_count(),
+            'posts_count': user.get_post_count()
         })
         
         return jsonify({
@@ -276,27 +321,125 @@ def get_user_posts_by_username(username):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get user's posts
-        posts = Post.query.filter_by(user_id=user.id)\
-                         .order_by(Post.created_at.desc())\
-                         .all()
+        current_user_id = get_current_user_id()
+        current_user = get_current_user()
+        
+        # Passing `cursor` or `limit` switches to keyset pagination, as in the feed
+        paginated = 'cursor' in request.args or 'limit' in request.args
+        position = limit = None
+        if paginated:
+            try:
+                position, limit = get_page_args(
+                    request.args,
+                    current_app.config['FEED_PAGE_SIZE'],
+                    current_app.config['FEED_MAX_PAGE_SIZE']
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        def build_posts():
+            # Get user's posts
+            query = Post.query.filter_by(user_id=user.id)
+            next_cursor = None
+            if paginated:
+                posts, next_cursor = keyset_page(query, Post.created_at, Post.id, position, limit)
+            else:
+                posts = query.order_by(Post.created_at.desc(), Post.id.desc()).all()
+            
+            posts_data = serialize_posts(
+                posts, viewer=current_user, author_detail=True,
+                comment_preview=current_app.config['FEED_COMMENT_PREVIEW'],
+                image_width=request.args.get('image_width', type=int)
+            )
+            if paginated:
+                return {'posts': posts_data, 'next_cursor': next_cursor}
+            return {'posts': posts_data}
+        
+        cache_key = viewer_key(current_user_id, request.args, 'profile_posts', user.id)
+        return jsonify(get_response_cache().get_or_compute(user_scope(user.id), cache_key, build_posts)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def profile_validator(username):
+    """Counters and newest-post aggregates of the profile, plus the viewer's relationship"""
+    user_posts = Post.user_id == User.id
+    row = db.session.query(
+        User.id, User.follower_count, User.following_count, User.post_count,
+        db.select(func.max(Post.id)).where(user_posts).scalar_subquery(),
+        db.select(func.sum(Post.like_count + Post.comment_count)).where(user_posts).scalar_subquery()
+    ).filter(User.username == username).first()
+    if row is None:
+        return None
+    
+    current_user_id = get_current_user_id()
+    graph = get_follow_graph()
+    return list(row) + [
+        graph.is_following(current_user_id, row[0]),
+        graph.is_following(row[0], current_user_id),
+        get_response_cache().generation(user_scope(row[0]))
+    ]
+
+
+@users_bp.route('/users/<username>/profile', methods=['GET'])
+@login_required
+@conditional_get(profile_validator)
+def get_profile_page(username):
+    """Profile page in one round trip: user, stats, relationship and first page of posts.
+
+    Runs a constant number of queries regardless of follower or post counts;
+    further posts are read from /users/<username>/posts with `next_cursor`.
+    Posts of private profiles are only included for the owner and followers.
+    """
+    try:
+        current_user_id = get_current_user_id()
+        
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        is_self = current_user_id == user.id
+        graph = get_follow_graph()
+        is_following = not is_self and graph.is_following(current_user_id, user.id)
+        follows_you = not is_self and graph.is_following(user.id, current_user_id)
+        can_view_posts = is_self or not user.is_private or is_following
         
         posts_data = []
-        for post in posts:
-            post_data = post.to_dict()
-            post_data['author'] = user.to_dict()
-            # Add is_liked for current user
-            current_user = User.query.get(get_current_user_id())
-            post_data['is_liked'] = post.is_liked_by(current_user) if current_user else False
-            # Add comments for this post
-            comments = Comment.query.filter_by(post_id=post.id)\
-                                   .order_by(Comment.created_at.asc())\
-                                   .options(db.joinedload(Comment.author))\
-                                   .all()
-            post_data['comments_list'] = [comment.to_dict() for comment in comments]
-            posts_data.append(post_data)
-        
-        return jsonify({'posts': posts_data}), 200
+        next_cursor = None
+        if can_view_posts:
+            limit = max(1, min(
+                request.args.get('limit', current_app.config['FEED_PAGE_SIZE'], type=int) or 1,
+                current_app.config['FEED_MAX_PAGE_SIZE']
+            ))
+            posts, next_cursor = keyset_page(
+                Post.query.filter_by(user_id=user.id), Post.created_at, Post.id, None, limit
+            )
+            posts_data = serialize_posts(
+                posts, viewer=get_current_user(), author_detail=True,
+                comment_preview=current_app.config['FEED_COMMENT_PREVIEW'],
+                image_width=request.args.get('image_width', type=int)
+            )
+        
+        # Stats come from the denormalized counters on the user row
+        user_data = user.to_dict('self' if is_self else 'public')
+        
+        return jsonify({
+            'user': user_data,
+            'stats': {
+                'followers_count': user.get_follower_count(),
+                'following_count': user.get_following_count(),
+                'posts_count': user.get_post_count()
+            },
+            'relationship': {
+                'is_self': is_self,
+                'is_following': is_following,
+                'follows_you': follows_you
+            },
+            'posts': posts_data,
+            'posts_visible': can_view_posts,
+            'next_cursor': next_cursor
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -327,6 +470,7 @@ def toggle_follow_user(username):
         if existing_follow:
             # Unfollow
             db.session.delete(existing_follow)
+            timeline_service.remove_author(current_user_id, user_to_follow.id)
             is_following = False
             message = f'You are no longer following {username}'
         else:
@@ -336,6 +480,7 @@ def toggle_follow_user(username):
                 following_id=user_to_follow.id
             )
             db.session.add(new_follow)
+            timeline_service.backfill_author(current_user_id, user_to_follow.id)
             is_following = True
             message = f'You are now following {username}'
         
@@ -351,29 +496,75 @@ def toggle_follow_user(username):
         return jsonify({'error': str(e)}), 500
 
 
+def get_list_user_id():
+    """The `user_id` query arg, defaulting to the current user"""
+    user_id_param = request.args.get('user_id')
+    if not user_id_param:
+        return get_current_user_id()
+    try:
+        return int(user_id_param)
+    except ValueError:
+        raise ValueError('Invalid user ID')
+
+
+def follow_list(key, list_column, user_column, total_counter, user_id):
+    """Compact, newest-first list of one side of `user_id`'s follow edges.
+
+    `list_column` selects the edges (e.g. Follow.following_id for followers)
+    and `user_column` the user listed for each edge. Passing `cursor` or
+    `limit` switches to keyset pagination over (created_at, id); `total=1`
+    adds the count from the user's denormalized counter.
+    """
+    paginated = 'cursor' in request.args or 'limit' in request.args
+    position = limit = None
+    if paginated:
+        position, limit = get_page_args(
+            request.args,
+            current_app.config['FOLLOW_LIST_PAGE_SIZE'],
+            current_app.config['FOLLOW_LIST_MAX_PAGE_SIZE']
+        )
+
+    query = db.session.query(Follow.created_at, Follow.id, User.id, User.username, User.profile_pic)\
+        .join(User, User.id == user_column)\
+        .filter(list_column == user_id)
+    next_cursor = None
+    if paginated:
+        rows, next_cursor = keyset_page(
+            query, Follow.created_at, Follow.id, position, limit,
+            position_of=lambda row: (row[0], row[1])
+        )
+    else:
+        rows = query.order_by(Follow.created_at.desc(), Follow.id.desc()).all()
+
+    # One adjacency lookup gives the viewer's follow state for the whole list
+    flags = get_follow_graph().following_flags(get_current_user_id(), [row[2] for row in rows])
+    users = [{
+        'id': row[2],
+        'username': row[3],
+        'profile_pic': row[4] or 'default.jpg',
+        'is_following': flags[row[2]]
+    } for row in rows]
+
+    payload = {key: users}
+    if paginated:
+        payload['next_cursor'] = next_cursor
+    if request.args.get('total') in ('1', 'true'):
+        payload['total'] = db.session.query(total_counter).filter(User.id == user_id).scalar() or 0
+    return payload
+
+
 @users_bp.route('/followers', methods=['GET'])
 @login_required
 def get_followers():
+    """Users following `user_id` (default: the current user)"""
     try:
-        # Check if a specific user ID is requested
-        user_id_param = request.args.get('user_id')
-        if user_id_param:
-            try:
-                user_id = int(user_id_param)
-            except ValueError:
-                return jsonify({'error': 'Invalid user ID'}), 400
-        else:
-            user_id = get_current_user_id()
-        
-        # Get users who are following the specified user
-        followers = User.query.join(Follow, Follow.follower_id == User.id)\
-            .filter(Follow.following_id == user_id)\
-            .all()
-        
-        followers_data = [follower.to_dict() for follower in followers]
-        
-        return jsonify({'followers': followers_data}), 200
+        user_id = get_list_user_id()
+        return jsonify(follow_list(
+            'followers', Follow.following_id, Follow.follower_id, User.follower_count, user_id
+        )), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -381,25 +572,14 @@ def get_followers():
 @users_bp.route('/following', methods=['GET'])
 @login_required
 def get_following():
+    """Users that `user_id` (default: the current user) follows"""
     try:
-        # Check if a specific user ID is requested
-        user_id_param = request.args.get('user_id')
-        if user_id_param:
-            try:
-                user_id = int(user_id_param)
-            except ValueError:
-                return jsonify({'error': 'Invalid user ID'}), 400
-        else:
-            user_id = get_current_user_id()
-        
-        # Get users that the specified user is following
-        following = User.query.join(Follow, Follow.following_id == User.id)\
-            .filter(Follow.follower_id == user_id)\
-            .all()
-        
-        following_data = [user.to_dict() for user in following]
-        
-        return jsonify({'following': following_data}), 200
+        user_id = get_list_user_id()
+        return jsonify(follow_list(
+            'following', Follow.follower_id, Follow.following_id, User.following_count, user_id
+        )), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,73 @@
+"""Avatar storage - originals and square variants kept as files in the blob store"""
+import base64
+import binascii
+import re
+
+from app import db
+from app.models import AvatarVariant
+from app.services.blob_store import get_blob_store
+from app.services.image_pipeline import AVATAR_SIZES, VARIANT_MIMETYPE, render_avatar_variants, render_in_pool
+
+AVATAR_URL_PATTERN = re.compile(r'^/api/avatars/([0-9a-f]{64})$')
+AVATAR_MAX_BYTES = 5 * 1024 * 1024
+
+
+def avatar_url(avatar_key):
+    """The short value stored in User.profile_pic"""
+    return f'/api/avatars/{avatar_key}'
+
+
+def store_avatar(data):
+    """Store an uploaded avatar and its resized variants, returning its URL.
+
+    Nothing is rendered twice: identical uploads share one avatar key.
+    """
+    store = get_blob_store()
+    avatar_key = store.put(data)
+
+    existing = {variant.size for variant in AvatarVariant.query.filter_by(avatar_key=avatar_key)}
+    missing = [size for size in AVATAR_SIZES if size not in existing]
+    if missing:
+        rendered = render_in_pool(data, missing, renderer=render_avatar_variants)
+        for size, variant_data in rendered.items():
+            db.session.add(AvatarVariant(
+                avatar_key=avatar_key,
+                size=size,
+                blob_key=store.put(variant_data),
+                mimetype=VARIANT_MIMETYPE
+            ))
+    return avatar_url(avatar_key)
+
+
+def profile_pic_value(value):
+    """Normalize a profile_pic sent as JSON before it is saved on the user.
+
+    Inline `data:` URIs are decoded and moved into the blob store so only the
+    short avatar URL reaches the user row. Raises ValueError for malformed or
+    oversized images.
+    """
+    if not isinstance(value, str) or not value.startswith('data:'):
+        return value
+    header, _, encoded = value.partition(',')
+    if ';base64' not in header or not header[len('data:'):].startswith('image/'):
+        raise ValueError('Unsupported profile picture')
+    try:
+        data = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError('Invalid profile picture data')
+    if len(data) > AVATAR_MAX_BYTES:
+        raise ValueError('File too large (max 5MB)')
+    return store_avatar(data)
+
+
+def find_variant(avatar_key, size=None):
+    """Smallest stored variant at least `size` pixels, else the largest one"""
+    variants = AvatarVariant.query.filter_by(avatar_key=avatar_key)\
+        .order_by(AvatarVariant.size.asc()).all()
+    if not variants:
+        return None
+    size = size or AVATAR_SIZES[-1]
+    for variant in variants:
+        if variant.size >= size:
+            return variant
+    return variants[-1]
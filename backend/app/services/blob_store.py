@@ -0,0 +1,63 @@
+"""Content-addressed local blob store - files are named by the sha256 of their bytes"""
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import current_app
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    @staticmethod
+    def key_for(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, key):
+        """Filesystem path for a key, sharded two levels deep"""
+        if not KEY_PATTERN.match(key or ''):
+            raise ValueError('Invalid blob key')
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, data):
+        """Store bytes and return their key; identical content is stored once"""
+        key = self.key_for(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return key
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+def get_blob_store():
+    """Return the app's blob store rooted at BLOB_STORE_ROOT"""
+    store = current_app.extensions.get('blob_store')
+    if store is None:
+        root = os.path.join(current_app.root_path, current_app.config['BLOB_STORE_ROOT'])
+        store = BlobStore(root)
+        current_app.extensions['blob_store'] = store
+    return store
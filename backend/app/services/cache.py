@@ -0,0 +1,297 @@
+"""Response cache - pluggable backends with write-event invalidation"""
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect as sa_inspect, select as db_select
+from sqlalchemy.orm import Session
+
+from app.models import Post, Follow, User
+
+
+class CacheBackend(ABC):
+    """Minimal key/value interface shared by all cache backends"""
+
+    @abstractmethod
+    def get(self, key):
+        """The stored value, or None when missing or expired"""
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """Store a value for `ttl` seconds (0 keeps it until evicted)"""
+
+    @abstractmethod
+    def incr(self, key):
+        """Atomically increment an integer counter and return the new value"""
+
+    @abstractmethod
+    def get_counter(self, key):
+        """Current value of a counter, 0 if it was never incremented"""
+
+    def size(self):
+        return None
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}  # kept apart so LRU eviction never resets a generation
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """Redis-backed cache shared by all workers (requires the `redis` package)"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, json.dumps(value), ex=ttl or None)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+    def get_counter(self, key):
+        return int(self._client.get(key) or 0)
+
+
+CACHE_BACKENDS = {
+    'memory': lambda config: MemoryCache(config['RESPONSE_CACHE_MAX_ENTRIES']),
+    'redis': lambda config: RedisCache(config['RESPONSE_CACHE_URL']),
+}
+
+# Scopes shared by many users: 'posts' covers the home feed's public posts,
+# 'users' the lists that render other users' profiles (conversations, notes, parties)
+POSTS_SCOPE = 'posts'
+USERS_SCOPE = 'users'
+
+
+def user_scope(user_id):
+    """Scope of one user's home feed and of the post lists on their profile"""
+    return f'user:{user_id}'
+
+
+def author_scope(author_id):
+    """Scope of a large author's posts and card, folded into their followers' feed keys.
+
+    Large authors are never fanned out (see timeline_service), and for the
+    same reason their writes do not walk the follower list here.
+    """
+    return f'author:{author_id}'
+
+
+# User columns rendered on other users' pages (the 'card' profile) and the privacy flag
+RENDERED_USER_COLUMNS = ('username', 'profile_pic')
+VISIBILITY_USER_COLUMNS = ('is_private',)
+
+
+def _changed(obj, columns):
+    state = sa_inspect(obj)
+    return any(state.attrs[column].history.has_changes() for column in columns)
+
+
+class _Invalidation:
+    """Users and shared scopes touched by one flush, resolved in bulk"""
+
+    def __init__(self):
+        self.user_ids = set()
+        self.author_ids = set()  # the author, plus their followers or author scope
+        self.post_ids = set()  # the post's owner
+        self.author_post_ids = set()  # the post's owner as an author
+        self.scopes = set()
+
+    def add(self, obj, dirty=False):
+        name = type(obj).__name__
+        if name == 'Post':
+            self.author_ids.add(obj.user_id)
+            self.scopes.add(POSTS_SCOPE)
+        elif name == 'PostImageVariant':
+            self.author_post_ids.add(obj.post_id)
+            self.scopes.add(POSTS_SCOPE)
+        elif name in ('Like', 'Comment'):
+            self.user_ids.add(obj.user_id)
+            self.post_ids.add(obj.post_id)
+        elif name == 'Follow':
+            self.user_ids.update((obj.follower_id, obj.following_id))
+        elif name == 'User':
+            # Email, theme and the like only show on the user's own pages
+            self.user_ids.add(obj.id)
+            if not dirty or _changed(obj, RENDERED_USER_COLUMNS):
+                self.author_ids.add(obj.id)
+                self.scopes.add(USERS_SCOPE)
+            if not dirty or _changed(obj, VISIBILITY_USER_COLUMNS):
+                self.author_ids.add(obj.id)
+                self.scopes.add(POSTS_SCOPE)
+
+    def resolve(self, connection, large_threshold):
+        """All invalidated scopes, using at most three queries.
+
+        Authors below `large_threshold` followers invalidate each follower;
+        larger ones only bump their author scope.
+        """
+        post_ids = self.post_ids | self.author_post_ids
+        if post_ids:
+            owners = connection.execute(
+                db_select(Post.id, Post.user_id).where(Post.id.in_(post_ids))
+            )
+            for post_id, user_id in owners:
+                self.user_ids.add(user_id)
+                if post_id in self.author_post_ids:
+                    self.author_ids.add(user_id)
+        if self.author_ids:
+            self.user_ids.update(self.author_ids)
+            counts = connection.execute(
+                db_select(User.id, User.follower_count).where(User.id.in_(self.author_ids))
+            )
+            small_ids = []
+            for author_id, follower_count in counts:
+                if (follower_count or 0) >= large_threshold:
+                    self.scopes.add(author_scope(author_id))
+                else:
+                    small_ids.append(author_id)
+            if small_ids:
+                followers = connection.execute(
+                    db_select(Follow.follower_id).where(Follow.following_id.in_(small_ids))
+                )
+                self.user_ids.update(row[0] for row in followers)
+        return self.scopes | {user_scope(user_id) for user_id in self.user_ids}
+
+
+class ResponseCache:
+    """Caches JSON payloads per scope; a scope is invalidated by bumping its generation.
+
+    Keys embed the scope's current generation, so invalidation is O(1) and
+    stale entries simply age out of the backend.
+    """
+
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation(self, scope):
+        """Current generation of `scope`; changes whenever the scope is invalidated"""
+        return self.backend.get_counter(f'gen:{scope}')
+
+    def invalidate(self, scope):
+        self.backend.incr(f'gen:{scope}')
+        self.invalidations += 1
+
+    def invalidate_users(self, user_ids):
+        for user_id in set(user_ids):
+            self.invalidate(user_scope(user_id))
+
+    def get_or_compute(self, scopes, key, compute):
+        """Return the cached value for `key` in `scopes`, computing it on a miss.
+
+        `scopes` is one scope or a tuple of them; the entry is dropped when
+        any of them is invalidated.
+        """
+        if isinstance(scopes, str):
+            scopes = (scopes,)
+        full_key = ':'.join(f'{scope}:{self.generation(scope)}' for scope in scopes) + f':{key}'
+        value = self.backend.get(full_key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        self.backend.set(full_key, value, self.ttl)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'entries': self.backend.size()
+        }
+
+
+def viewer_key(viewer_id, args, *parts):
+    """Cache key for a viewer-specific response, independent of query arg order"""
+    return ':'.join([str(viewer_id), *map(str, parts), urlencode(sorted(args.items(multi=True)))])
+
+
+def init_response_cache(app):
+    backend = CACHE_BACKENDS[app.config['RESPONSE_CACHE_BACKEND']](app.config)
+    app.extensions['response_cache'] = ResponseCache(backend, app.config['RESPONSE_CACHE_TTL'])
+
+
+def get_response_cache():
+    return current_app.extensions['response_cache']
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_invalidations(session, flush_context):
+    if not has_app_context() or 'response_cache' not in current_app.extensions:
+        return
+    invalidation = _Invalidation()
+    for obj in list(session.new) + list(session.deleted):
+        invalidation.add(obj)
+    for obj in session.dirty:
+        invalidation.add(obj, dirty=True)
+    scopes = session.info.setdefault('cache_invalidations', set())
+    scopes.update(invalidation.resolve(session.connection(), current_app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    scopes = session.info.pop('cache_invalidations', None)
+    if scopes and has_app_context() and 'response_cache' in current_app.extensions:
+        cache = get_response_cache()
+        for scope in scopes:
+            cache.invalidate(scope)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
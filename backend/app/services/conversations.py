@@ -0,0 +1,243 @@
+"""Conversation summaries - inbox rows kept in step with direct messages"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Conversation, Message
+from app.services import message_search, message_sync
+from app.services.pagination import after_position, encode_cursor
+
+PREVIEW_LENGTH = 200
+
+
+def ordered_pair(user_id, other_id):
+    return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+
+def pair_filter(user_id, other_id):
+    """Messages exchanged between two users, in either direction"""
+    return or_(
+        and_(Message.sender_id == user_id, Message.recipient_id == other_id),
+        and_(Message.sender_id == other_id, Message.recipient_id == user_id)
+    )
+
+
+def participant_sides(user_id):
+    """One condition per side of the pair, each a prefix of its own inbox index"""
+    return Conversation.user_a_id == user_id, Conversation.user_b_id == user_id
+
+
+def inbox_page(user_id, position=None, limit=None):
+    """One newest-first page of a user's inbox as ((Conversation, Message) rows, next_cursor).
+
+    Each side of the pair is a range scan over ix_conversation_a_last or
+    ix_conversation_b_last, and the two ranges are merged with UNION; OR-ing
+    the participant columns would need an index merge plus a filesort.
+    Without a `limit` the whole inbox is returned.
+    """
+    def side(condition):
+        ranged = db.select(Conversation.id, Conversation.last_message_at).where(condition)
+        if position:
+            ranged = ranged.where(after_position(Conversation.last_message_at, Conversation.id, position))
+        ranged = ranged.order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+        if limit:
+            ranged = ranged.limit(limit + 1)
+        return db.select(ranged.subquery())
+
+    page = db.union(*(side(condition) for condition in participant_sides(user_id))).subquery()
+    query = db.session.query(Conversation, Message)\
+        .join(page, page.c.id == Conversation.id)\
+        .outerjoin(Message, Message.id == Conversation.last_message_id)\
+        .order_by(page.c.last_message_at.desc(), page.c.id.desc())
+    if not limit:
+        return query.all(), None
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0].last_message_at, rows[-1][0].id)
+    return rows, next_cursor
+
+
+def find_conversation(user_id, other_id):
+    user_a_id, user_b_id = ordered_pair(user_id, other_id)
+    return Conversation.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).first()
+
+
+def get_or_create_conversation(user_id, other_id):
+    """The pair's summary row, created if missing (safe against concurrent creators)"""
+    conversation = find_conversation(user_id, other_id)
+    if conversation:
+        return conversation
+
+    user_a_id, user_b_id = ordered_pair(user_id, other_id)
+    try:
+        with db.session.begin_nested():
+            conversation = Conversation(user_a_id=user_a_id, user_b_id=user_b_id)
+            db.session.add(conversation)
+    except IntegrityError:
+        conversation = Conversation.query.filter_by(user_a_id=user_a_id, user_b_id=user_b_id).one()
+    return conversation
+
+
+def message_preview(message):
+    if message.content:
+        return message.content[:PREVIEW_LENGTH]
+    return f'[{message.message_type}]'
+
+
+def _set_last_message(conversation, message):
+    conversation.last_message_id = message.id
+    conversation.last_message_at = message.created_at
+    conversation.last_sender_id = message.sender_id
+    conversation.last_message_type = message.message_type
+    conversation.last_message_preview = message_preview(message)
+
+
+def record_message(message):
+    """Attach a new message to its pair's conversation and fold it into the summary.
+
+    Runs in the caller's transaction; call it after adding the message.
+    """
+    # Look the pair up before the message is flushed so it is inserted once, complete
+    with db.session.no_autoflush:
+        conversation = get_or_create_conversation(message.sender_id, message.recipient_id)
+    message.conversation_id = conversation.id
+    db.session.flush()
+    message_sync.log_message(message)
+    message_search.index_message(message)
+    _set_last_message(conversation, message)
+    # SQL-side increments so concurrent senders never lose an unread
+    if message.recipient_id == conversation.user_a_id:
+        conversation.unread_a = Conversation.unread_a + 1
+    else:
+        conversation.unread_b = Conversation.unread_b + 1
+    return conversation
+
+
+def _reader_columns(conversation, reader_id):
+    """(watermark, unread) column names for the reader's side of the pair"""
+    if reader_id == conversation.user_a_id:
+        return 'read_up_to_a', 'unread_a'
+    return 'read_up_to_b', 'unread_b'
+
+
+def _newer_than(conversation, reader_id, read_up_to, watermark_at=None):
+    """Messages to the reader newer than their watermark.
+
+    Bounding created_at by the watermark message's timestamp keeps this a
+    range scan over the conversation's tail instead of its whole history.
+    """
+    query = Message.query.filter(
+        Message.conversation_id == conversation.id,
+        Message.recipient_id == reader_id,
+        Message.id > read_up_to
+    )
+    if watermark_at is not None:
+        query = query.filter(Message.created_at >= watermark_at)
+    return query
+
+
+def _unread(conversation, reader_id, read_up_to):
+    watermark_at = db.select(Message.created_at).where(Message.id == read_up_to).scalar_subquery()
+    return _newer_than(conversation, reader_id, read_up_to)\
+        .filter(or_(Message.created_at >= watermark_at, watermark_at.is_(None)))
+
+
+def _unread_count(conversation, reader_id, read_up_to):
+    return _unread(conversation, reader_id, read_up_to).count()
+
+
+def _expire_viewed(conversation, reader_id, read_from, read_up_to):
+    """Start the expiry clock on view-once messages the reader has just read"""
+    # Resolved up front: MySQL cannot UPDATE a table it also selects from in a subquery
+    watermark_at = db.session.query(Message.created_at).filter(Message.id == read_from).scalar() \
+        if read_from else None
+    expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['VIEW_ONCE_GRACE_SECONDS'])
+    _newer_than(conversation, reader_id, read_from, watermark_at).filter(
+        Message.id <= read_up_to,
+        Message.delete_after_viewing == True,
+        # A later 24h deadline must not outlive the view-once one
+        or_(Message.expires_at.is_(None), Message.expires_at > expires_at)
+    ).update({'expires_at': expires_at}, synchronize_session=False)
+
+
+def mark_read_up_to(reader_id, other_id, message_id):
+    """Advance the reader's watermark to `message_id`, never moving it back.
+
+    Returns the conversation, or None when the pair has none.
+    """
+    conversation = find_conversation(reader_id, other_id)
+    if not conversation or message_id is None:
+        return conversation
+
+    read_column, unread_column = _reader_columns(conversation, reader_id)
+    read_from = getattr(conversation, read_column)
+    if message_id <= read_from:
+        return conversation
+
+    # Guarded so a late, older receipt cannot rewind a concurrent newer one
+    column = getattr(Conversation, read_column)
+    advance = Conversation.query.filter(Conversation.id == conversation.id, column < message_id)
+    moved = 0
+    if conversation.last_message_id is not None and message_id >= conversation.last_message_id:
+        # Only while no newer message has landed since the row was loaded
+        moved = advance.filter(Conversation.last_message_id <= message_id)\
+            .update({read_column: message_id, unread_column: 0}, synchronize_session='evaluate')
+    if not moved:
+        # Counted inside the UPDATE so an unread committed meanwhile is not overwritten
+        unread = _unread(conversation, reader_id, message_id)\
+            .with_entities(func.count(Message.id)).scalar_subquery()
+        moved = advance.update({read_column: message_id, unread_column: unread}, synchronize_session='fetch')
+    if moved:
+        message_sync.log_read(conversation, reader_id, message_id)
+    _expire_viewed(conversation, reader_id, read_from, message_id)
+    return conversation
+
+
+def mark_read(reader_id, other_id):
+    """Mark everything in the pair's conversation read by `reader_id`"""
+    conversation = find_conversation(reader_id, other_id)
+    if conversation:
+        mark_read_up_to(reader_id, other_id, conversation.last_message_id)
+    return conversation
+
+
+def refresh_conversation(user_id, other_id):
+    """Recompute a pair's summary from its messages, e.g. after deletions.
+
+    Drops the summary when no messages remain.
+    """
+    last = Message.query.filter(pair_filter(user_id, other_id))\
+        .order_by(Message.created_at.desc(), Message.id.desc()).first()
+    if last is None:
+        conversation = find_conversation(user_id, other_id)
+        if conversation:
+            db.session.delete(conversation)
+        return None
+
+    conversation = get_or_create_conversation(user_id, other_id)
+    Message.query.filter(pair_filter(user_id, other_id), Message.conversation_id.is_(None))\
+        .update({'conversation_id': conversation.id}, synchronize_session=False)
+    _set_last_message(conversation, last)
+    for reader_id, other_id in ((conversation.user_a_id, conversation.user_b_id),
+                                (conversation.user_b_id, conversation.user_a_id)):
+        read_column, unread_column = _reader_columns(conversation, reader_id)
+        # Messages flagged read before watermarks existed still count as read
+        legacy = db.session.query(func.max(Message.id))\
+            .filter_by(sender_id=other_id, recipient_id=reader_id, is_read=True).scalar() or 0
+        read_up_to = max(getattr(conversation, read_column) or 0, legacy)
+        setattr(conversation, read_column, read_up_to)
+        setattr(conversation, unread_column, _unread_count(conversation, reader_id, read_up_to))
+    return conversation
+
+
+def refresh_conversations(messages):
+    """Refresh the summaries of every pair touched by `messages`"""
+    pairs = {ordered_pair(message.sender_id, message.recipient_id) for message in messages}
+    for user_id, other_id in pairs:
+        refresh_conversation(user_id, other_id)
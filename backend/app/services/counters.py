@@ -0,0 +1,73 @@
+"""Reconciliation of denormalized engagement counters"""
+from app import db
+from app.models import User, Post, Like, Comment, Follow
+
+
+def _user_sources():
+    return {
+        'follower_count': Follow.following_id,
+        'following_count': Follow.follower_id,
+        'post_count': Post.user_id,
+    }
+
+
+def _post_sources():
+    return {
+        'like_count': Like.post_id,
+        'comment_count': Comment.post_id,
+    }
+
+
+def _reconcile_table(model, sources, batch_size):
+    """Recompute counters for `model` in id-ordered chunks.
+
+    Each chunk costs one grouped COUNT per counter; only rows whose stored
+    value drifted are updated. Returns the number of rows corrected.
+    """
+    table = model.__table__
+    fixed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(model.id, *[getattr(model, name) for name in sources])\
+            .filter(model.id > last_id)\
+            .order_by(model.id)\
+            .limit(batch_size).all()
+        if not rows:
+            return fixed
+
+        ids = [row[0] for row in rows]
+        actual = {}
+        for name, column in sources.items():
+            counts = db.session.query(column, db.func.count())\
+                .filter(column.in_(ids))\
+                .group_by(column)
+            actual[name] = dict(counts.all())
+
+        for row in rows:
+            values = {}
+            for index, name in enumerate(sources, start=1):
+                true_value = actual[name].get(row[0], 0)
+                if row[index] != true_value:
+                    values[name] = true_value
+            if values:
+                db.session.execute(table.update().where(table.c.id == row[0]).values(values))
+                fixed += 1
+
+        db.session.commit()
+        last_id = ids[-1]
+
+
+def reconcile_user_counters(batch_size=1000):
+    return _reconcile_table(User, _user_sources(), batch_size)
+
+
+def reconcile_post_counters(batch_size=1000):
+    return _reconcile_table(Post, _post_sources(), batch_size)
+
+
+def reconcile_all(batch_size=1000):
+    """Recompute every counter, returning {'users': n, 'posts': n} rows corrected"""
+    return {
+        'users': reconcile_user_counters(batch_size),
+        'posts': reconcile_post_counters(batch_size),
+    }
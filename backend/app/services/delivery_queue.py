@@ -0,0 +1,53 @@
+"""Delivery queue - direct messages held until the recipient's socket acknowledges them"""
+from datetime import datetime
+
+from app import db
+from app.models import Conversation, Message, PendingDelivery
+from app.services.serializers import serialize_messages
+
+
+def enqueue(message):
+    """Hold a message for its recipient; runs in the caller's transaction"""
+    db.session.execute(PendingDelivery.__table__.insert(), [{
+        'user_id': message.recipient_id,
+        'message_id': message.id,
+        'created_at': datetime.utcnow()
+    }])
+
+
+def pending_batch(user_id, limit):
+    """The oldest `limit` held messages for a user, as one batch.
+
+    Returns (messages_data, up_to, has_more); `up_to` is the queue position
+    the client acks once it has stored the batch, or None when the queue is
+    empty.
+    """
+    rows = db.session.query(PendingDelivery.id, Message)\
+        .join(Message, Message.id == PendingDelivery.message_id)\
+        .filter(PendingDelivery.user_id == user_id)\
+        .order_by(PendingDelivery.id)\
+        .limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], None, False
+
+    messages = [message for _, message in rows]
+    conversation_ids = {message.conversation_id for message in messages}
+    conversations = {conversation.id: conversation for conversation in
+                     Conversation.query.filter(Conversation.id.in_(conversation_ids))}
+    messages_data, _ = serialize_messages(messages, conversations=conversations)
+    return messages_data, rows[-1][0], has_more
+
+
+def ack(user_id, up_to):
+    """Trim everything the client confirmed, returning how many entries were removed"""
+    return PendingDelivery.query.filter(PendingDelivery.user_id == user_id, PendingDelivery.id <= up_to)\
+        .delete(synchronize_session=False)
+
+
+def ack_message(user_id, message_id):
+    """Trim one message the client received live"""
+    return PendingDelivery.query.filter(PendingDelivery.user_id == user_id,
+                                        PendingDelivery.message_id == message_id)\
+        .delete(synchronize_session=False)
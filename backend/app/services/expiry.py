@@ -0,0 +1,183 @@
+"""Expiry sweeper - deletes expired messages and notes off the request path"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import MediaDeletion, Message, Note
+from app.services import conversations as conversation_service
+from app.services import message_search, message_sync
+
+
+class ExpirySweeper:
+    """Deletes expired rows in bounded batches over the `expires_at` indexes.
+
+    Each batch is one id range read, one bulk DELETE and one commit, so a
+    large backlog never holds long locks. A sweep stops after `max_batches`
+    per table and leaves the rest to the next run. Media of swept messages
+    is queued in `media_deletion` for the sender's client to remove from
+    storage. Sync log events older than `event_retention_days` are pruned
+    the same way.
+    """
+
+    def __init__(self, batch_size=500, max_batches=20, event_retention_days=7):
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.event_retention_days = event_retention_days
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.errors = 0
+        self.messages_deleted = 0
+        self.notes_deleted = 0
+        self.events_deleted = 0
+        self.media_queued = 0
+        self.last_run_at = None
+        self.last_duration_ms = None
+
+    def sweep_messages(self, now=None):
+        """Delete expired messages, returning how many were removed"""
+        now = now or datetime.utcnow()
+        deleted = 0
+        for _ in range(self.max_batches):
+            rows = db.session.query(Message.id, Message.sender_id, Message.recipient_id, Message.media_path)\
+                .filter(Message.expires_at <= now)\
+                .order_by(Message.expires_at)\
+                .limit(self.batch_size).all()
+            if not rows:
+                break
+
+            media = [{'owner_id': row.sender_id, 'path': row.media_path, 'created_at': now}
+                     for row in rows if row.media_path]
+            if media:
+                db.session.execute(MediaDeletion.__table__.insert(), media)
+            message_ids = [row.id for row in rows]
+            message_search.remove_messages(message_ids)
+            Message.query.filter(Message.id.in_(message_ids))\
+                .delete(synchronize_session=False)
+            conversation_service.refresh_conversations(rows)
+            message_sync.log_deletions(rows)
+            db.session.commit()
+
+            deleted += len(rows)
+            with self._lock:
+                self.messages_deleted += len(rows)
+                self.media_queued += len(media)
+            if len(rows) < self.batch_size:
+                break
+        return deleted
+
+    def sweep_notes(self, now=None):
+        """Delete expired notes, returning how many were removed"""
+        now = now or datetime.utcnow()
+        deleted = 0
+        for _ in range(self.max_batches):
+            ids = [row[0] for row in db.session.query(Note.id)
+                   .filter(Note.expires_at <= now)
+                   .order_by(Note.expires_at)
+                   .limit(self.batch_size)]
+            if not ids:
+                break
+
+            Note.query.filter(Note.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+            deleted += len(ids)
+            with self._lock:
+                self.notes_deleted += len(ids)
+            if len(ids) < self.batch_size:
+                break
+        return deleted
+
+    def sweep_events(self, now=None):
+        """Drop sync log events past the retention window, returning how many were removed"""
+        before = (now or datetime.utcnow()) - timedelta(days=self.event_retention_days)
+        deleted = 0
+        for _ in range(self.max_batches):
+            count = message_sync.prune_events(before, self.batch_size)
+            db.session.commit()
+            deleted += count
+            with self._lock:
+                self.events_deleted += count
+            if count < self.batch_size:
+                break
+        return deleted
+
+    def sweep(self):
+        """One full pass over every expiring table, returning the counts"""
+        started = time.monotonic()
+        try:
+            result = {
+                'messages': self.sweep_messages(),
+                'notes': self.sweep_notes(),
+                'events': self.sweep_events()
+            }
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.runs += 1
+                self.last_run_at = datetime.utcnow()
+                self.last_duration_ms = round((time.monotonic() - started) * 1000, 1)
+        return result
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'messages_deleted': self.messages_deleted,
+            'notes_deleted': self.notes_deleted,
+            'events_deleted': self.events_deleted,
+            'media_queued': self.media_queued,
+            'last_run_at': self.last_run_at.isoformat() + 'Z' if self.last_run_at else None,
+            'last_duration_ms': self.last_duration_ms
+        }
+
+
+def init_expiry_sweeper(app):
+    app.extensions['expiry_sweeper'] = ExpirySweeper(
+        app.config['EXPIRY_SWEEP_BATCH_SIZE'],
+        app.config['EXPIRY_SWEEP_MAX_BATCHES'],
+        app.config['MESSAGE_EVENT_RETENTION_DAYS']
+    )
+
+
+def get_expiry_sweeper():
+    return current_app.extensions['expiry_sweeper']
+
+
+def start_expiry_sweeper(app, socketio):
+    """Run the sweeper every EXPIRY_SWEEP_INTERVAL seconds in a background task"""
+    interval = app.config['EXPIRY_SWEEP_INTERVAL']
+    if interval <= 0:
+        return None
+
+    def run():
+        sweeper = app.extensions['expiry_sweeper']
+        while True:
+            with app.app_context():
+                try:
+                    sweeper.sweep()
+                except Exception as e:
+                    print(f'Error in expiry sweep: {e}')
+                finally:
+                    db.session.remove()
+            socketio.sleep(interval)
+
+    return socketio.start_background_task(run)
+
+
+def claim_media_deletions(owner_id, limit=100):
+    """Hand the owner's queued media paths to their client, removing them from the queue"""
+    rows = db.session.query(MediaDeletion.id, MediaDeletion.path)\
+        .filter(MediaDeletion.owner_id == owner_id)\
+        .order_by(MediaDeletion.id)\
+        .limit(limit).all()
+    if rows:
+        MediaDeletion.query.filter(MediaDeletion.id.in_([row.id for row in rows]))\
+            .delete(synchronize_session=False)
+    return [row.path for row in rows]
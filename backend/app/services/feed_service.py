@@ -0,0 +1,42 @@
+"""Feed queries - post visibility rules expressed in SQL"""
+from sqlalchemy import or_
+
+from app import db
+from app.models import Follow, Post, User
+
+
+def followed_ids_query(user_id):
+    """Subquery of ids of users that `user_id` follows"""
+    return db.session.query(Follow.following_id).filter(Follow.follower_id == user_id)
+
+
+def follower_ids_query(user_id):
+    """Subquery of ids of users following `user_id`"""
+    return db.session.query(Follow.follower_id).filter(Follow.following_id == user_id)
+
+
+def follower_id_batches(user_id, batch_size):
+    """Yield lists of follower ids of `user_id` in ascending id order"""
+    last_id = 0
+    while True:
+        batch = [row[0] for row in follower_ids_query(user_id)
+                 .filter(Follow.follower_id > last_id)
+                 .order_by(Follow.follower_id)
+                 .limit(batch_size)]
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def visible_posts_query(viewer_id):
+    """Posts the viewer may see in the home feed.
+
+    A post is visible if it is the viewer's own post, its author's profile is
+    not private, or the viewer follows the author.
+    """
+    return Post.query.join(User, Post.user_id == User.id).filter(or_(
+        Post.user_id == viewer_id,
+        db.func.coalesce(User.is_private, False) == False,  # noqa: E712
+        Post.user_id.in_(followed_ids_query(viewer_id))
+    ))
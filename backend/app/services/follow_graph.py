@@ -0,0 +1,115 @@
+"""Follow graph - process-local adjacency cache over the follow table"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Follow
+
+
+class FollowGraph:
+    """Sorted arrays of followed ids per user, loaded on demand.
+
+    Membership checks are a binary search over a compact int array instead
+    of a query. Entries are dropped when the user's follows change (see the
+    session listeners below) and expire after `ttl` seconds so writes made
+    by other processes are picked up.
+    """
+
+    def __init__(self, max_users=50000, ttl=30):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._following = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def following(self, user_id):
+        """Ascending array of ids that `user_id` follows"""
+        with self._lock:
+            entry = self._following.get(user_id)
+            if entry is not None and entry[1] >= time.monotonic():
+                self._following.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+
+        self.misses += 1
+        rows = db.session.query(Follow.following_id)\
+            .filter(Follow.follower_id == user_id)\
+            .order_by(Follow.following_id)
+        ids = array('q', (row[0] for row in rows))
+
+        with self._lock:
+            self._following[user_id] = (ids, time.monotonic() + self.ttl)
+            self._following.move_to_end(user_id)
+            while len(self._following) > self.max_users:
+                self._following.popitem(last=False)
+        return ids
+
+    def is_following(self, follower_id, following_id):
+        ids = self.following(follower_id)
+        index = bisect_left(ids, following_id)
+        return index < len(ids) and ids[index] == following_id
+
+    def following_flags(self, follower_id, user_ids):
+        """{user_id: bool} for many users with a single adjacency lookup"""
+        ids = self.following(follower_id)
+        flags = {}
+        for user_id in user_ids:
+            index = bisect_left(ids, user_id)
+            flags[user_id] = index < len(ids) and ids[index] == user_id
+        return flags
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._following.pop(user_id, None)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'users': len(self._following)
+        }
+
+
+def init_follow_graph(app):
+    app.extensions['follow_graph'] = FollowGraph(
+        app.config['FOLLOW_GRAPH_MAX_USERS'],
+        app.config['FOLLOW_GRAPH_TTL']
+    )
+
+
+def get_follow_graph():
+    return current_app.extensions['follow_graph']
+
+
+def is_following(follower_id, following_id):
+    return get_follow_graph().is_following(follower_id, following_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_follow_changes(session, flush_context):
+    changed = session.info.setdefault('follow_graph_changes', set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Follow):
+            changed.add(obj.follower_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_follow_changes(session):
+    changed = session.info.pop('follow_graph_changes', None)
+    if changed and has_app_context() and 'follow_graph' in current_app.extensions:
+        graph = get_follow_graph()
+        for user_id in changed:
+            graph.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_follow_changes(session):
+    session.info.pop('follow_graph_changes', None)
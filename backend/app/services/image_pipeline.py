@@ -0,0 +1,146 @@
+"""Image derivative pipeline - resized WebP variants rendered in a process pool"""
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from app import db, socketio
+from app.models import Post, PostImageVariant
+from app.services.blob_store import get_blob_store
+
+# Variant name -> maximum width in pixels, smallest first
+POST_IMAGE_VARIANTS = {
+    'thumb': 320,
+    'feed': 1080,
+    'full': 2048,
+}
+
+# Square avatar edge lengths in pixels
+AVATAR_SIZES = (32, 64, 256)
+
+VARIANT_MIMETYPE = 'image/webp'
+
+_executor = None
+
+
+def render_variants(data, widths, quality=80):
+    """Render WebP variants of an image, never upscaling.
+
+    Runs in a worker process, so it only takes and returns plain values:
+    {name: (bytes, width, height)}. Animated images are left alone.
+    """
+    image = Image.open(io.BytesIO(data))
+    if getattr(image, 'is_animated', False):
+        return {}
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {}
+    for name, max_width in widths.items():
+        resized = image.copy()
+        if resized.width > max_width:
+            height = max(1, round(resized.height * max_width / resized.width))
+            resized = resized.resize((max_width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, format='WEBP', quality=quality, method=4)
+        variants[name] = (buffer.getvalue(), resized.width, resized.height)
+    return variants
+
+
+def render_avatar_variants(data, sizes, quality=80):
+    """Render square, center-cropped WebP avatars: {size: bytes}"""
+    image = Image.open(io.BytesIO(data))
+    image.seek(0)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {}
+    for size in sizes:
+        edge = min(size, image.width, image.height)
+        cropped = ImageOps.fit(image, (edge, edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        cropped.save(buffer, format='WEBP', quality=quality, method=4)
+        variants[size] = buffer.getvalue()
+    return variants
+
+
+def get_executor():
+    """Process pool shared by all image work in this process"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=current_app.config['IMAGE_PROCESS_WORKERS'])
+    return _executor
+
+
+def render_in_pool(data, widths, renderer=render_variants):
+    """Render variants in the process pool and wait for the result"""
+    future = get_executor().submit(renderer, data, widths, current_app.config['IMAGE_WEBP_QUALITY'])
+    return future.result()
+
+
+def generate_post_variants(post_id):
+    """Render and store the size-bucketed variants of a post's uploaded image"""
+    post = Post.query.get(post_id)
+    if not post or not post.image_key:
+        return 0
+
+    store = get_blob_store()
+    with open(store.path(post.image_key), 'rb') as f:
+        data = f.read()
+
+    rendered = render_in_pool(data, POST_IMAGE_VARIANTS)
+
+    PostImageVariant.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+    for name, (variant_data, width, height) in rendered.items():
+        db.session.add(PostImageVariant(
+            post_id=post_id,
+            name=name,
+            blob_key=store.put(variant_data),
+            mimetype=VARIANT_MIMETYPE,
+            width=width,
+            height=height
+        ))
+    db.session.commit()
+    return len(rendered)
+
+
+def _post_variants_task(app, post_id):
+    with app.app_context():
+        try:
+            generate_post_variants(post_id)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'Image variants failed for post {post_id}: {str(e)}')
+
+
+def schedule_post_variants(post_id):
+    """Generate a post's image variants off the request thread"""
+    app = current_app._get_current_object()
+    if not app.config['IMAGE_PIPELINE_ASYNC']:
+        generate_post_variants(post_id)
+        return
+    socketio.start_background_task(_post_variants_task, app, post_id)
+
+
+def pick_variant(variants, width=None):
+    """Pick the smallest variant at least `width` pixels wide.
+
+    Without a width hint the feed-sized variant is preferred. Falls back to
+    the largest available variant, or None when there are none.
+    """
+    if not variants:
+        return None
+    by_width = sorted(variants, key=lambda variant: variant.width)
+    if width is None:
+        for variant in by_width:
+            if variant.name == 'feed':
+                return variant
+        width = POST_IMAGE_VARIANTS['feed']
+    for variant in by_width:
+        if variant.width >= width:
+            return variant
+    return by_width[-1]
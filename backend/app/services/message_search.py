@@ -0,0 +1,143 @@
+"""Message search - per-user inverted index over direct message text"""
+import re
+
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Message, MessageTerm
+from app.services.pagination import after_position, encode_cursor
+
+TERM_LENGTH = 64
+WORD_PATTERN = re.compile(r'\w+')
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+MAX_SCAN_PAGES = 10  # candidate pages read per request while checking phrases
+
+
+def tokenize(text):
+    """Lowercased words of `text` in order, cut to the indexed term length"""
+    return [word[:TERM_LENGTH] for word in WORD_PATTERN.findall((text or '').lower())]
+
+
+def parse_query(text, max_terms, min_prefix=1):
+    """Split a query into (terms, phrases).
+
+    terms is a list of (term, is_prefix): `word*` is a prefix term, and the
+    words of a quoted phrase are exact terms. phrases lists the word
+    sequences that must appear contiguously. Raises ValueError past
+    `max_terms` distinct terms, or for a prefix shorter than `min_prefix`
+    (`a*` would read and sort most of the user's index for every page).
+    """
+    phrases = [words for words in (tokenize(phrase) for phrase in PHRASE_PATTERN.findall(text)) if words]
+    terms = {(word, False) for words in phrases for word in words}
+    for raw in PHRASE_PATTERN.sub(' ', text).split():
+        words = tokenize(raw)
+        if not words:
+            continue
+        if raw.endswith('*'):
+            # Only the last word of `foo-ba*` is a prefix
+            terms.update((word, False) for word in words[:-1])
+            if len(words[-1]) < min_prefix:
+                raise ValueError(f'Prefix searches need at least {min_prefix} characters')
+            terms.add((words[-1], True))
+        else:
+            terms.update((word, False) for word in words)
+    if len(terms) > max_terms:
+        raise ValueError(f'At most {max_terms} search terms')
+    # Drive the lookup from the likely most selective term: exact, then longest
+    return sorted(terms, key=lambda term: (term[1], -len(term[0]), term[0])), phrases
+
+
+def _contains_phrase(words, phrase):
+    size = len(phrase)
+    return any(words[i:i + size] == phrase for i in range(len(words) - size + 1))
+
+
+def message_terms(message):
+    """Index rows for a message, one per distinct word and participant"""
+    terms = set(tokenize(message.content))
+    return [{
+        'user_id': user_id,
+        'term': term,
+        'message_id': message.id,
+        'created_at': message.created_at
+    } for term in terms for user_id in (message.sender_id, message.recipient_id)]
+
+
+def index_message(message):
+    """Add a flushed message to both participants' indexes, in the caller's transaction"""
+    rows = message_terms(message)
+    if rows:
+        db.session.execute(MessageTerm.__table__.insert(), rows)
+
+
+def remove_messages(message_ids):
+    """Drop index rows of deleted messages (foreign keys cascade only on MySQL)"""
+    if message_ids:
+        MessageTerm.query.filter(MessageTerm.message_id.in_(message_ids))\
+            .delete(synchronize_session=False)
+
+
+def _term_condition(column, term, prefix):
+    if prefix:
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return column.like(escaped + '%', escape='\\')
+    return column == term
+
+
+def search(user_id, terms, phrases, position, limit):
+    """Messages visible to `user_id` containing every term, newest first.
+
+    Candidates come from joining one index range per term; phrase queries
+    are then checked against the message text, reading further candidate
+    pages until `limit` matches are found or MAX_SCAN_PAGES were read.
+    Returns (messages, next_cursor).
+    """
+    if not terms:
+        return [], None
+
+    first = aliased(MessageTerm)
+    query = db.session.query(first.message_id, first.created_at)\
+        .filter(first.user_id == user_id, _term_condition(first.term, *terms[0]))
+    for term, prefix in terms[1:]:
+        other = aliased(MessageTerm)
+        # created_at completes the index prefix, so an exact-term probe is a point lookup
+        query = query.join(other, and_(
+            other.user_id == user_id,
+            _term_condition(other.term, term, prefix),
+            other.created_at == first.created_at,
+            other.message_id == first.message_id
+        ))
+    # A prefix can match several words of one message
+    query = query.distinct()
+
+    found = []
+    for _ in range(MAX_SCAN_PAGES):
+        page = query
+        if position:
+            page = page.filter(after_position(first.created_at, first.message_id, position))
+        candidates = page.order_by(first.created_at.desc(), first.message_id.desc()).limit(limit + 1).all()
+        scanned = candidates[:limit]
+
+        messages = {}
+        if scanned:
+            messages = {message.id: message for message in
+                        Message.query.filter(Message.id.in_([row.message_id for row in scanned]))}
+        for row in scanned:
+            message = messages.get(row.message_id)
+            if message is None:
+                continue
+            words = tokenize(message.content)
+            if all(_contains_phrase(words, phrase) for phrase in phrases):
+                found.append(message)
+            if len(found) == limit:
+                position = (row.created_at, row.message_id)
+                more = row is not scanned[-1] or len(candidates) > limit
+                return found, encode_cursor(*position) if more else None
+
+        if len(candidates) <= limit:
+            return found, None
+        position = (scanned[-1].created_at, scanned[-1].message_id)
+
+    # Rare phrases: hand back what was found and let the client keep scanning
+    return found, encode_cursor(*position)
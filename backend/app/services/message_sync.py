@@ -0,0 +1,142 @@
+"""Message sync - change log writes and the delta reads behind /api/messages/sync"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.models import Conversation, Message, MessageEvent, User
+from app.services.serializers import serialize_users
+from app.services.user_cache import get_users
+
+
+def _log(rows):
+    if rows:
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault('created_at', now)
+        db.session.execute(MessageEvent.__table__.insert(), rows)
+
+
+def log_message(message):
+    """A new message, for both participants; the message must be flushed"""
+    _log([{
+        'user_id': user_id,
+        'kind': 'message',
+        'conversation_id': message.conversation_id,
+        'message_id': message.id,
+        'actor_id': message.sender_id
+    } for user_id in (message.sender_id, message.recipient_id)])
+
+
+def log_read(conversation, reader_id, read_up_to):
+    """A read watermark move, for both participants"""
+    _log([{
+        'user_id': user_id,
+        'kind': 'read',
+        'conversation_id': conversation.id,
+        'actor_id': reader_id,
+        'read_up_to': read_up_to
+    } for user_id in (conversation.user_a_id, conversation.user_b_id)])
+
+
+def log_deletions(messages):
+    """Deleted messages (rows with id, sender_id, recipient_id), for both participants"""
+    _log([{
+        'user_id': user_id,
+        'kind': 'delete',
+        'message_id': message.id,
+        'actor_id': message.sender_id
+    } for message in messages for user_id in (message.sender_id, message.recipient_id)])
+
+
+def latest_cursor():
+    """The log's settled high-water mark across all users.
+
+    Handing this out (rather than the caller's own newest event) keeps idle
+    cursors moving with the log, so pruning other users' events never makes
+    them look stale.
+
+    Event ids are allocated at insert but become visible at commit, so event
+    105 can be readable while 104 is still in flight. Events logged within
+    MESSAGE_SYNC_SETTLE_SECONDS are therefore held back: the mark stops just
+    below the oldest of them, and a late commit is picked up by the next sync.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['MESSAGE_SYNC_SETTLE_SECONDS'])
+    unsettled = db.session.query(func.min(MessageEvent.id)).filter(MessageEvent.created_at > cutoff).scalar()
+    if unsettled is not None:
+        return unsettled - 1
+    return db.session.query(func.max(MessageEvent.id)).scalar() or 0
+
+
+def sync(user_id, since, limit):
+    """Everything that changed for `user_id` after event `since`, at most `limit` events.
+
+    Returns a dict with the new cursor, `has_more` when the caller should
+    sync again straight away, and `reset` when `since` predates the retained
+    log and the client must refetch its conversations instead.
+    """
+    oldest = db.session.query(func.min(MessageEvent.id)).scalar()
+    if oldest is not None and since < oldest - 1:
+        return {'cursor': latest_cursor(), 'has_more': False, 'reset': True,
+                'messages': [], 'participants': {}, 'reads': [], 'deleted': []}
+
+    # Read first, so an event logged during this sync lands above the returned cursor
+    high = latest_cursor()
+    events = MessageEvent.query.filter(MessageEvent.user_id == user_id,
+                                       MessageEvent.id > since, MessageEvent.id <= high)\
+        .order_by(MessageEvent.id).limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    deleted = [event.message_id for event in events if event.kind == 'delete']
+    message_ids = {event.message_id for event in events if event.kind == 'message'} - set(deleted)
+    messages = Message.query.filter(Message.id.in_(message_ids))\
+        .order_by(Message.created_at, Message.id).all() if message_ids else []
+
+    # Latest watermark per (conversation, reader) in this window
+    reads = {}
+    for event in events:
+        if event.kind == 'read':
+            reads[(event.conversation_id, event.actor_id)] = event.read_up_to
+
+    conversation_ids = {message.conversation_id for message in messages} | {key[0] for key in reads}
+    conversations = {conversation.id: conversation for conversation in
+                     Conversation.query.filter(Conversation.id.in_(conversation_ids))} if conversation_ids else {}
+
+    user_ids = {message.sender_id for message in messages} | {message.recipient_id for message in messages}
+    user_ids |= {conversation.other_user_id(user_id) for conversation in conversations.values()}
+    participants = serialize_users(get_users(user_ids, User.load_profile('card')).values())
+
+    if has_more:
+        cursor = events[-1].id
+    else:
+        # Nothing else is logged for this user up to the high-water mark
+        cursor = max(since, high)
+
+    return {
+        'cursor': cursor,
+        'has_more': has_more,
+        'reset': False,
+        'messages': [message.to_dict(conversations.get(message.conversation_id), user_data=participants, compact=True)
+                     for message in messages],
+        'participants': {str(participant_id): data for participant_id, data in participants.items()},
+        'reads': [{
+            'other_user_id': conversations[conversation_id].other_user_id(user_id)
+            if conversation_id in conversations else None,
+            'reader_id': reader_id,
+            'read_up_to': read_up_to
+        } for (conversation_id, reader_id), read_up_to in reads.items()],
+        'deleted': deleted
+    }
+
+
+def prune_events(before, batch_size):
+    """Delete one batch of events older than `before`, returning how many were removed"""
+    ids = [row[0] for row in db.session.query(MessageEvent.id)
+           .filter(MessageEvent.created_at < before)
+           .order_by(MessageEvent.created_at)
+           .limit(batch_size)]
+    if ids:
+        MessageEvent.query.filter(MessageEvent.id.in_(ids)).delete(synchronize_session=False)
+    return len(ids)
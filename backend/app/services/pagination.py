@@ -0,0 +1,82 @@
+"""Keyset (cursor) pagination helpers shared by list endpoints"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position into an opaque URL-safe cursor"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor.
+
+    Raises ValueError when the cursor is malformed so routes can answer 400.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def get_page_args(args, default_limit, max_limit):
+    """Read `cursor` and `limit` query args, returning (position, limit)"""
+    cursor = args.get('cursor')
+    position = decode_cursor(cursor) if cursor else None
+
+    limit = args.get('limit', default_limit, type=int)
+    limit = max(1, min(limit or default_limit, max_limit))
+    return position, limit
+
+
+def after_position(created_col, id_col, position):
+    """SQL condition selecting rows that sort after `position` newest first"""
+    created_at, row_id = position
+    return or_(
+        created_col < created_at,
+        and_(created_col == created_at, id_col < row_id)
+    )
+
+
+def before_position(created_col, id_col, position):
+    """SQL condition selecting rows newer than `position`"""
+    created_at, row_id = position
+    return or_(
+        created_col > created_at,
+        and_(created_col == created_at, id_col > row_id)
+    )
+
+
+def keyset_page(query, created_col, id_col, position, limit, position_of=None, newest_first=True):
+    """Return one newest-first page of rows strictly after `position`.
+
+    Reads limit + 1 rows to find out whether another page exists and returns
+    (rows, next_cursor) where next_cursor is None on the last page.
+    `position_of` maps a row to its (created_at, id) when the ordering
+    columns do not live on the selected entity itself. With
+    `newest_first=False` the page walks forward in time instead, oldest first.
+    """
+    if newest_first:
+        if position:
+            query = query.filter(after_position(created_col, id_col, position))
+        rows = query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1).all()
+    else:
+        if position:
+            query = query.filter(before_position(created_col, id_col, position))
+        rows = query.order_by(created_col.asc(), id_col.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if position_of:
+            next_cursor = encode_cursor(*position_of(last))
+        else:
+            next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
@@ -0,0 +1,53 @@
+"""Read receipt coalescing - one watermark write and receipt per burst of reads"""
+import threading
+
+from flask import current_app
+
+
+class ReadReceiptBuffer:
+    """Highest message id read per (reader, sender) pair within a short window.
+
+    Clients report reads one message at a time as they scroll; the first
+    report for a pair opens a window of `window` seconds and later reports
+    only raise the pending id. When the window closes the pair is drained
+    once: one watermark update, one commit, one receipt.
+    """
+
+    def __init__(self, window=0.5):
+        self.window = window
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.received = 0
+        self.flushed = 0
+
+    def add(self, reader_id, sender_id, message_id):
+        """Record a read, returning True when it opens a new window for the pair"""
+        key = (reader_id, sender_id)
+        with self._lock:
+            self.received += 1
+            current = self._pending.get(key)
+            self._pending[key] = message_id if current is None else max(current, message_id)
+            return current is None
+
+    def pop(self, reader_id, sender_id):
+        """The highest pending message id for the pair, closing its window"""
+        with self._lock:
+            message_id = self._pending.pop((reader_id, sender_id), None)
+            if message_id is not None:
+                self.flushed += 1
+            return message_id
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'flushed': self.flushed,
+            'pending': len(self._pending)
+        }
+
+
+def init_read_receipts(app):
+    app.extensions['read_receipts'] = ReadReceiptBuffer(app.config['READ_RECEIPT_WINDOW'])
+
+
+def get_read_receipts():
+    return current_app.extensions['read_receipts']
@@ -0,0 +1,252 @@
+"""User search - in-memory prefix and trigram index over usernames"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import islice
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app import db, socketio
+from app.models import User
+
+
+def trigrams(text):
+    """Padded character trigrams, so short queries and word edges still match"""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class UserSearchIndex:
+    """Username index answering typeahead and fuzzy queries without a table scan.
+
+    A sorted array of (username, id) pairs serves prefix lookups by binary
+    search; a trigram -> ids map finds substring and misspelled matches.
+    It is built from the user table on first use, kept current by the
+    session listeners below and rebuilt after `ttl` seconds so registrations
+    handled by other processes appear.
+    """
+
+    def __init__(self, ttl=300, min_similarity=0.3, short_scan_limit=5000):
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.short_scan_limit = short_scan_limit
+        self._sorted = []
+        self._names = {}
+        self._trigrams = {}
+        self._built_at = None
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # held by the one builder at a time
+        self._changes = None  # username changes seen while a rebuild is reading the table
+
+    def _ensure_built(self):
+        if self._built_at is None:
+            # Nothing to serve yet: one request builds, the others wait for it
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+            return
+        if time.monotonic() - self._built_at < self.ttl:
+            return
+        # Stale: one background rebuild while everyone keeps serving the old index
+        if self._build_lock.acquire(blocking=False):
+            self._built_at = time.monotonic()  # no second rebuild is scheduled meanwhile
+            socketio.start_background_task(self._rebuild_task, current_app._get_current_object())
+
+    def _rebuild_task(self, app):
+        with app.app_context():
+            try:
+                self._rebuild()
+            except Exception as e:
+                app.logger.error(f'User search index rebuild failed: {str(e)}')
+            finally:
+                db.session.remove()
+                self._build_lock.release()
+
+    def _rebuild(self):
+        """Read the user table into fresh structures and swap them in; caller holds _build_lock"""
+        with self._lock:
+            self._changes = {}
+        rows = db.session.query(User.id, User.username).all()
+
+        names, ordered, grams = {}, [], {}
+        for user_id, username in rows:
+            name = username.lower()
+            names[user_id] = name
+            ordered.append((name, user_id))
+            for gram in trigrams(name):
+                grams.setdefault(gram, set()).add(user_id)
+        ordered.sort()
+
+        with self._lock:
+            changes, self._changes = self._changes, None
+            self._sorted, self._names, self._trigrams = ordered, names, grams
+            self._built_at = time.monotonic()
+            # Registrations committed while the table was read must not be lost
+            for user_id, username in changes.items():
+                if username is None:
+                    self.remove(user_id)
+                else:
+                    self.add(user_id, username)
+
+    def add(self, user_id, username):
+        with self._lock:
+            if self._changes is not None:
+                self._changes[user_id] = username
+            if self._built_at is None:
+                return
+            self._remove(user_id)
+            name = username.lower()
+            self._names[user_id] = name
+            insort(self._sorted, (name, user_id))
+            for gram in trigrams(name):
+                self._trigrams.setdefault(gram, set()).add(user_id)
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._changes is not None:
+                self._changes[user_id] = None
+            self._remove(user_id)
+
+    def _remove(self, user_id):
+        with self._lock:
+            name = self._names.pop(user_id, None)
+            if name is None:
+                return
+            index = bisect_left(self._sorted, (name, user_id))
+            if index < len(self._sorted) and self._sorted[index] == (name, user_id):
+                del self._sorted[index]
+            for gram in trigrams(name):
+                ids = self._trigrams.get(gram)
+                if ids is not None:
+                    ids.discard(user_id)
+                    if not ids:
+                        del self._trigrams[gram]
+
+    def prefix(self, text, limit):
+        """Ids of up to `limit` usernames starting with `text`, alphabetically"""
+        with self._lock:
+            index = bisect_left(self._sorted, (text,))
+            matches = []
+            while index < len(self._sorted) and len(matches) < limit:
+                name, user_id = self._sorted[index]
+                if not name.startswith(text):
+                    break
+                matches.append(user_id)
+                index += 1
+            return matches
+
+    def fuzzy(self, text, limit=100):
+        """{user_id: similarity} for usernames sharing enough trigrams with `text`.
+
+        Queries shorter than a trigram share none with mid-string matches,
+        so they fall back to a substring scan of the names. That scan stops
+        after `limit` matches or `short_scan_limit` names, so a keystroke
+        never holds the lock for a walk over every user.
+        """
+        if len(text) < 3:
+            scores = {}
+            with self._lock:
+                for user_id, name in islice(self._names.items(), self.short_scan_limit):
+                    if text in name:
+                        scores[user_id] = len(text) / len(name)
+                        if len(scores) >= limit:
+                            break
+            return scores
+
+        query_grams = trigrams(text)
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._trigrams.get(gram, ()))
+            scores = {}
+            for user_id, count in shared.items():
+                name_grams = len(trigrams(self._names[user_id]))
+                similarity = count / (len(query_grams) + name_grams - count)
+                if similarity >= self.min_similarity or text in self._names[user_id]:
+                    scores[user_id] = similarity
+            return scores
+
+    def search(self, text, limit=20, followed=None):
+        """Ranked user ids: exact, then prefix, then substring/fuzzy matches.
+
+        Within each tier users the viewer follows (`followed(ids)` returning
+        {id: bool}) rank first, then closer and shorter names.
+        """
+        text = text.strip().lower()
+        if not text:
+            return []
+        self._ensure_built()
+
+        candidates = {user_id: 1.0 for user_id in self.prefix(text, limit * 5)}
+        for user_id, similarity in self.fuzzy(text, limit * 5).items():
+            candidates.setdefault(user_id, similarity)
+
+        follows = followed(list(candidates)) if followed else {}
+        with self._lock:
+            def rank(user_id):
+                name = self._names.get(user_id, '')
+                if name == text:
+                    tier = 0
+                elif name.startswith(text):
+                    tier = 1
+                elif text in name:
+                    tier = 2
+                else:
+                    tier = 3
+                return (tier, not follows.get(user_id, False), -candidates[user_id], len(name), name)
+
+            ranked = sorted((user_id for user_id in candidates if user_id in self._names), key=rank)
+        return ranked[:limit]
+
+    def stats(self):
+        return {
+            'users': len(self._names),
+            'trigrams': len(self._trigrams),
+            'built': self._built_at is not None
+        }
+
+
+def init_search_index(app):
+    app.extensions['user_search_index'] = UserSearchIndex(
+        app.config['USER_SEARCH_INDEX_TTL'],
+        app.config['USER_SEARCH_MIN_SIMILARITY'],
+        app.config['USER_SEARCH_SHORT_SCAN_LIMIT']
+    )
+
+
+def get_search_index():
+    return current_app.extensions['user_search_index']
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_username_changes(session, flush_context):
+    changes = session.info.setdefault('search_index_changes', {})
+    for obj in session.new:
+        if isinstance(obj, User):
+            changes[obj.id] = obj.username
+    for obj in session.dirty:
+        if isinstance(obj, User) and sa_inspect(obj).attrs.username.history.has_changes():
+            changes[obj.id] = obj.username
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changes[obj.id] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_username_changes(session):
+    changes = session.info.pop('search_index_changes', None)
+    if changes and has_app_context() and 'user_search_index' in current_app.extensions:
+        index = get_search_index()
+        for user_id, username in changes.items():
+            if username is None:
+                index.remove(user_id)
+            else:
+                index.add(user_id, username)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_username_changes(session):
+    session.info.pop('search_index_changes', None)
@@ -0,0 +1,132 @@
+"""Batch serializers - hydrate a whole page of rows in a constant number of queries"""
+from app import db
+from app.models import User, Like, Comment, PostImageVariant
+from app.services.image_pipeline import pick_variant
+from app.services.user_cache import get_users
+
+
+def serialize_users(users, profile='card'):
+    """Return {user_id: user.to_dict(profile)} for a collection of users"""
+    return {user.id: user.to_dict(profile) for user in users}
+
+
+def serialize_comments(comments, user_data=None):
+    """Serialize comments, batching their authors.
+
+    `user_data` may hold already-serialized users to reuse.
+    """
+    user_data = dict(user_data or {})
+    missing = {comment.author for comment in comments
+               if comment.author and comment.user_id not in user_data}
+    user_data.update(serialize_users(missing))
+    return [comment.to_dict(author_data=user_data.get(comment.user_id)) for comment in comments]
+
+
+def serialize_messages(messages, conversation=None, compact=False, conversations=None):
+    """Serialize messages, loading and serializing each participant once.
+
+    `conversation` is the summary all messages belong to; messages from
+    several pairs take a `conversations` map by id instead.
+
+    Returns (messages_data, participants) where participants maps user id
+    to card. With `compact` the messages carry sender_id/receiver_id and
+    the caller sends `participants` alongside them; otherwise every message
+    embeds the shared cards.
+    """
+    messages = list(messages)
+    user_ids = {message.sender_id for message in messages} | {message.recipient_id for message in messages}
+    users = get_users(user_ids, User.load_profile('card'))
+    participants = serialize_users(users.values())
+    messages_data = [message.to_dict(
+        conversations.get(message.conversation_id) if conversations is not None else conversation,
+        user_data=participants, compact=compact
+    ) for message in messages]
+    return messages_data, participants
+
+
+def latest_comments(post_ids, per_post):
+    """Latest `per_post` comments of each post, fetched with one windowed query.
+
+    Returns {post_id: [comments oldest first]}.
+    """
+    if not post_ids or per_post <= 0:
+        return {}
+    ranked = db.session.query(
+        Comment.id.label('id'),
+        db.func.row_number().over(
+            partition_by=Comment.post_id,
+            order_by=(Comment.created_at.desc(), Comment.id.desc())
+        ).label('position')
+    ).filter(Comment.post_id.in_(post_ids)).subquery()
+
+    comments = Comment.query.join(ranked, ranked.c.id == Comment.id)\
+        .filter(ranked.c.position <= per_post)\
+        .order_by(Comment.created_at.asc(), Comment.id.asc())\
+        .options(db.joinedload(Comment.author).options(User.load_profile('card')))\
+        .all()
+
+    comments_by_post = {}
+    for comment in comments:
+        comments_by_post.setdefault(comment.post_id, []).append(comment)
+    return comments_by_post
+
+
+def serialize_posts(posts, viewer=None, author_detail=False, comment_preview=0, image_width=None):
+    """Serialize a page of posts the way Post.to_dict does, without per-post queries.
+
+    Like and comment counts come from the post's counter columns.
+
+    author_detail: replace the `author` username with the author's card.
+    comment_preview: add a `comments_list` with each post's latest N comments,
+        oldest first; the full thread is paginated by GET /api/posts/<id>/comments.
+    image_width: display width hint used to pick the smallest adequate image variant.
+    """
+    posts = list(posts)
+    if not posts:
+        return []
+
+    post_ids = [post.id for post in posts]
+
+    liked_ids = set()
+    if viewer:
+        liked_ids = {row[0] for row in db.session.query(Like.post_id).filter(
+            Like.user_id == viewer.id,
+            Like.post_id.in_(post_ids)
+        )}
+
+    authors = {user.id: user for user in User.query.options(User.load_profile('card')).filter(
+        User.id.in_({post.user_id for post in posts})
+    )}
+
+    variants_by_post = {}
+    uploaded_ids = [post.id for post in posts if post.image_key]
+    if uploaded_ids:
+        for variant in PostImageVariant.query.filter(PostImageVariant.post_id.in_(uploaded_ids)):
+            variants_by_post.setdefault(variant.post_id, []).append(variant)
+
+    comments_by_post = latest_comments(post_ids, comment_preview)
+
+    user_data = {}
+    if author_detail or comment_preview:
+        detailed = set(authors.values()) if author_detail else set()
+        for post_comments in comments_by_post.values():
+            detailed.update(comment.author for comment in post_comments if comment.author)
+        user_data = serialize_users(detailed)
+
+    posts_data = []
+    for post in posts:
+        post_dict = post.to_dict(
+            author=authors[post.user_id],
+            is_liked=post.id in liked_ids
+        )
+        variants = variants_by_post.get(post.id)
+        if variants:
+            chosen = pick_variant(variants, image_width)
+            post_dict['image'] = post_dict['image_url'] = chosen.to_dict()['url']
+            post_dict['image_variants'] = {variant.name: variant.to_dict() for variant in variants}
+        if author_detail:
+            post_dict['author'] = user_data[post.user_id]
+        if comment_preview:
+            post_dict['comments_list'] = serialize_comments(comments_by_post.get(post.id, []), user_data)
+        posts_data.append(post_dict)
+    return posts_data
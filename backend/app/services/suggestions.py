@@ -0,0 +1,136 @@
+"""People you may know - offline suggestion scoring over the whole social graph"""
+import heapq
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models import Follow, Message, User, UserSuggestion
+from app.models.models import party_members
+from app.services.follow_graph import get_follow_graph
+
+# Score contributed by each signal
+MUTUAL_WEIGHT = 1.0     # per followed user who follows the candidate
+PARTY_WEIGHT = 0.5      # per party shared with the candidate
+MESSAGE_WEIGHT = 2.0    # once, if the two users have exchanged messages
+
+
+def load_graph(read_batch=10000):
+    """Read the follow graph, party memberships and message partners into memory.
+
+    Returns (following, party_members_by_party, parties_by_user, partners),
+    each mapping an id to a set of ids.
+    """
+    following = defaultdict(set)
+    for follower_id, following_id in db.session.query(Follow.follower_id, Follow.following_id)\
+            .yield_per(read_batch):
+        following[follower_id].add(following_id)
+
+    members = defaultdict(set)
+    parties = defaultdict(set)
+    for party_id, user_id in db.session.query(party_members.c.party_id, party_members.c.user_id)\
+            .yield_per(read_batch):
+        members[party_id].add(user_id)
+        parties[user_id].add(party_id)
+
+    partners = defaultdict(set)
+    for sender_id, recipient_id in db.session.query(Message.sender_id, Message.recipient_id)\
+            .distinct().yield_per(read_batch):
+        partners[sender_id].add(recipient_id)
+        partners[recipient_id].add(sender_id)
+
+    return following, members, parties, partners
+
+
+def score_user(user_id, following, members, parties, partners, top_k, max_party_size):
+    """Top `top_k` suggestion rows for one user, best first"""
+    followed = following.get(user_id, set())
+
+    # Friends of friends: every followed user's followees, counted
+    mutual = Counter()
+    for followed_id in followed:
+        mutual.update(following.get(followed_id, ()))
+
+    # Co-members of the user's parties; very large parties say little about a pair
+    shared = Counter()
+    for party_id in parties.get(user_id, ()):
+        if len(members[party_id]) <= max_party_size:
+            shared.update(members[party_id])
+
+    messaged = partners.get(user_id, set())
+
+    candidates = (set(mutual) | set(shared) | messaged) - followed
+    candidates.discard(user_id)
+
+    scored = []
+    for candidate in candidates:
+        score = MUTUAL_WEIGHT * mutual[candidate] + PARTY_WEIGHT * shared[candidate]
+        if candidate in messaged:
+            score += MESSAGE_WEIGHT
+        scored.append((score, -candidate))
+
+    return [{
+        'user_id': user_id,
+        'suggested_id': -negated_id,
+        'score': score,
+        'mutual_count': mutual[-negated_id],
+        'shared_parties': shared[-negated_id],
+        'messaged': -negated_id in messaged
+    } for score, negated_id in heapq.nlargest(top_k, scored)]
+
+
+def compute_suggestions(batch_size=500):
+    """Recompute and store suggestions for every user, returning the row count"""
+    top_k = current_app.config['SUGGESTIONS_PER_USER']
+    max_party_size = current_app.config['SUGGESTIONS_MAX_PARTY_SIZE']
+    graph = load_graph()
+
+    table = UserSuggestion.__table__
+    written = 0
+    last_id = 0
+    while True:
+        user_ids = [row[0] for row in db.session.query(User.id)
+                    .filter(User.id > last_id)
+                    .order_by(User.id)
+                    .limit(batch_size)]
+        if not user_ids:
+            return written
+
+        now = datetime.utcnow()
+        rows = []
+        for user_id in user_ids:
+            for row in score_user(user_id, *graph, top_k, max_party_size):
+                row['created_at'] = now
+                rows.append(row)
+
+        # Replace the batch's suggestions in one transaction
+        db.session.execute(table.delete().where(table.c.user_id.in_(user_ids)))
+        if rows:
+            db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+        written += len(rows)
+        last_id = user_ids[-1]
+
+
+def get_suggestions(user_id, limit):
+    """Stored suggestions for a user, skipping anyone followed since the last run"""
+    rows = db.session.query(
+        UserSuggestion.suggested_id, UserSuggestion.mutual_count,
+        UserSuggestion.shared_parties, UserSuggestion.messaged,
+        User.username, User.profile_pic
+    ).join(User, User.id == UserSuggestion.suggested_id)\
+        .filter(UserSuggestion.user_id == user_id)\
+        .order_by(UserSuggestion.score.desc())\
+        .limit(limit * 2).all()
+
+    flags = get_follow_graph().following_flags(user_id, [row[0] for row in rows])
+    return [{
+        'id': row[0],
+        'username': row[4],
+        'profile_pic': row[5] or 'default.jpg',
+        'mutual_count': row[1],
+        'shared_parties': row[2],
+        'messaged': row[3]
+    } for row in rows if not flags[row[0]]][:limit]
@@ -0,0 +1,210 @@
+"""Home timeline - fan-out-on-write with read-time merging for large authors"""
+from abc import ABC, abstractmethod
+
+from flask import current_app
+
+from app import db, socketio
+from app.models import Post, User, TimelineEntry
+from app.services.cache import get_response_cache
+from app.services.feed_service import followed_ids_query, follower_id_batches
+from app.services.pagination import after_position, encode_cursor
+
+
+class TimelineStore(ABC):
+    """Storage interface for materialized timelines.
+
+    A timeline holds (created_at, post_id) pairs per owner, read newest first.
+    """
+
+    @abstractmethod
+    def add_entries(self, post, user_ids):
+        """Put a post on each user's timeline, skipping pairs already present"""
+
+    @abstractmethod
+    def has_entries(self, user_id, post_ids):
+        """Return the subset of `post_ids` already on the user's timeline"""
+
+    @abstractmethod
+    def remove_post(self, post_id):
+        """Drop a post from every timeline"""
+
+    @abstractmethod
+    def remove_author(self, user_id, author_id):
+        """Drop an author's posts from one user's timeline"""
+
+    @abstractmethod
+    def page(self, user_id, position, limit):
+        """Up to `limit` (created_at, post_id) pairs after `position`, newest first"""
+
+
+class SQLTimelineStore(TimelineStore):
+    """Timeline store backed by the timeline_entry table"""
+
+    def add_entries(self, post, user_ids):
+        rows = [{
+            'user_id': user_id,
+            'post_id': post.id,
+            'author_id': post.user_id,
+            'created_at': post.created_at
+        } for user_id in user_ids]
+        if rows:
+            # A concurrent backfill may already have written some pairs; skip them
+            # instead of aborting the rest of the fan-out on the unique constraint
+            insert = TimelineEntry.__table__.insert()\
+                .prefix_with('IGNORE', dialect='mysql')\
+                .prefix_with('OR IGNORE', dialect='sqlite')
+            db.session.execute(insert, rows)
+
+    def has_entries(self, user_id, post_ids):
+        if not post_ids:
+            return set()
+        rows = db.session.query(TimelineEntry.post_id).filter(
+            TimelineEntry.user_id == user_id,
+            TimelineEntry.post_id.in_(post_ids)
+        )
+        return {row[0] for row in rows}
+
+    def remove_post(self, post_id):
+        TimelineEntry.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+
+    def remove_author(self, user_id, author_id):
+        TimelineEntry.query.filter_by(user_id=user_id, author_id=author_id)\
+            .delete(synchronize_session=False)
+
+    def page(self, user_id, position, limit):
+        query = db.session.query(TimelineEntry.created_at, TimelineEntry.post_id)\
+            .filter(TimelineEntry.user_id == user_id)
+        if position:
+            query = query.filter(after_position(TimelineEntry.created_at, TimelineEntry.post_id, position))
+        rows = query.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc())\
+            .limit(limit).all()
+        return [tuple(row) for row in rows]
+
+
+TIMELINE_STORES = {
+    'sql': SQLTimelineStore,
+}
+
+
+def get_timeline_store():
+    """Return the timeline store configured by TIMELINE_STORE"""
+    store = current_app.extensions.get('timeline_store')
+    if store is None:
+        store = TIMELINE_STORES[current_app.config['TIMELINE_STORE']]()
+        current_app.extensions['timeline_store'] = store
+    return store
+
+
+def is_large_author(user_id):
+    """Large authors are not fanned out; their posts are merged at read time"""
+    threshold = current_app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']
+    follower_count = db.session.query(User.follower_count).filter(User.id == user_id).scalar()
+    return (follower_count or 0) >= threshold
+
+
+def large_followed_ids(user_id):
+    """Ids of the large authors that `user_id` follows"""
+    threshold = current_app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']
+    rows = db.session.query(User.id).filter(
+        User.id.in_(followed_ids_query(user_id)),
+        User.follower_count >= threshold
+    )
+    return [row[0] for row in rows]
+
+
+def fan_out_post(post_id):
+    """Write a post onto its author's timeline and each follower's timeline"""
+    post = Post.query.get(post_id)
+    if not post:
+        return 0
+
+    # Entries are Core inserts the cache's flush listener never sees, so each
+    # batch invalidates its owners' cached feeds once it is committed
+    cache = get_response_cache()
+    store = get_timeline_store()
+    store.add_entries(post, [post.user_id])
+    db.session.commit()
+    cache.invalidate_users([post.user_id])
+
+    if is_large_author(post.user_id):
+        return 0
+
+    written = 0
+    for batch in follower_id_batches(post.user_id, current_app.config['TIMELINE_FANOUT_BATCH_SIZE']):
+        store.add_entries(post, batch)
+        db.session.commit()
+        cache.invalidate_users(batch)
+        written += len(batch)
+    return written
+
+
+def _fan_out_task(app, post_id):
+    with app.app_context():
+        try:
+            fan_out_post(post_id)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f'Timeline fan-out failed for post {post_id}: {str(e)}')
+
+
+def schedule_fan_out(post_id):
+    """Fan a newly committed post out in the background"""
+    app = current_app._get_current_object()
+    if not app.config['TIMELINE_FANOUT_ASYNC']:
+        fan_out_post(post_id)
+        return
+    socketio.start_background_task(_fan_out_task, app, post_id)
+
+
+def backfill_author(user_id, author_id):
+    """Copy an author's recent posts onto a user's timeline (e.g. after a follow)"""
+    if author_id != user_id and is_large_author(author_id):
+        return 0
+
+    store = get_timeline_store()
+    posts = Post.query.filter_by(user_id=author_id)\
+        .order_by(Post.created_at.desc(), Post.id.desc())\
+        .limit(current_app.config['TIMELINE_BACKFILL_POSTS']).all()
+    existing = store.has_entries(user_id, [post.id for post in posts])
+
+    added = 0
+    for post in posts:
+        if post.id not in existing:
+            store.add_entries(post, [user_id])
+            added += 1
+    return added
+
+
+def remove_author(user_id, author_id):
+    """Drop an author's posts from a user's timeline (e.g. after an unfollow)"""
+    get_timeline_store().remove_author(user_id, author_id)
+
+
+def remove_post(post_id):
+    get_timeline_store().remove_post(post_id)
+
+
+def read_timeline(user_id, position, limit):
+    """Return one page of the user's timeline as (posts, next_cursor).
+
+    Materialized entries are merged with recent posts of followed large
+    authors, whose posts were never fanned out.
+    """
+    entries = get_timeline_store().page(user_id, position, limit + 1)
+
+    large_ids = large_followed_ids(user_id)
+    if large_ids:
+        query = db.session.query(Post.created_at, Post.id).filter(Post.user_id.in_(large_ids))
+        if position:
+            query = query.filter(after_position(Post.created_at, Post.id, position))
+        merged = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1).all()
+        entries = sorted(set(entries) | {tuple(row) for row in merged}, reverse=True)[:limit + 1]
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(*entries[-1])
+
+    post_ids = [post_id for _, post_id in entries]
+    posts_by_id = {post.id: post for post in Post.query.filter(Post.id.in_(post_ids)).all()} if post_ids else {}
+    return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id], next_cursor
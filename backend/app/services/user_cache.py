@@ -0,0 +1,41 @@
+"""Request-scoped user lookups - each user row is loaded at most once per request"""
+from flask import g, has_app_context, session
+
+from app.models import User
+
+
+def _cache():
+    if not has_app_context():
+        return {}
+    if 'user_cache' not in g:
+        g.user_cache = {}
+    return g.user_cache
+
+
+def get_user(user_id):
+    """The user with `user_id`, or None; repeated lookups in a request are free"""
+    if user_id is None:
+        return None
+    cache = _cache()
+    if user_id not in cache:
+        cache[user_id] = User.query.get(user_id)
+    return cache[user_id]
+
+
+def get_users(user_ids, *options):
+    """{id: User} for the existing users among `user_ids`.
+
+    Ids not seen earlier in the request are fetched with a single IN query;
+    `options` (e.g. load_only) apply to that query.
+    """
+    cache = _cache()
+    missing = {user_id for user_id in user_ids if user_id not in cache}
+    if missing:
+        found = {user.id: user for user in User.query.options(*options).filter(User.id.in_(missing))}
+        for user_id in missing:
+            cache[user_id] = found.get(user_id)
+    return {user_id: cache[user_id] for user_id in user_ids if cache.get(user_id) is not None}
+
+
+def get_current_user():
+    return get_user(session.get('user_id'))
@@ -1,10 +1,22 @@
-from flask import request
+from flask import current_app, request, session
 from flask_socketio import emit, join_room, leave_room
-from app import socketio
+from app import socketio, db
+from app.models import Message
+from app.services import conversations as conversation_service
+from app.services import delivery_queue
+from app.services.read_receipts import get_read_receipts
 
 # Store connected users
 connected_users = {}
 
+def user_room(user_id):
+    """Personal room of a user's sockets (party rooms use the bare party id)"""
+    return f'user_{user_id}'
+
+def session_user_id():
+    """The user logged in on the HTTP session this socket was opened with"""
+    return session.get('user_id')
+
 @socketio.on('connect')
 def handle_connect():
     print(f'Client connected: {request.sid}')
@@ -22,12 +34,65 @@ def handle_disconnect():
         del connected_users[user_id_to_remove]
         print(f'User {user_id_to_remove} disconnected')
 
+def emit_pending_messages(user_id):
+    """Send the next batch of messages still waiting for the user's acknowledgement"""
+    messages_data, up_to, has_more = delivery_queue.pending_batch(
+        user_id, current_app.config['DELIVERY_BATCH_SIZE']
+    )
+    if up_to is not None:
+        emit('pending_messages', {
+            'messages': messages_data,
+            'up_to': up_to,
+            'has_more': has_more
+        })
+        print(f'Delivered {len(messages_data)} held messages to {user_id}')
+
 @socketio.on('register_user')
 def handle_register_user(data):
-    user_id = data.get('userId')
-    if user_id:
-        connected_users[user_id] = request.sid
-        print(f'User registered: {user_id} with socket {request.sid}')
+    user_id = session_user_id()
+    # Only the user logged in on this socket's session may register, and receive their queue
+    if not user_id or data.get('userId') not in (None, user_id):
+        emit('error', {'message': 'Unauthorized'})
+        return
+    connected_users[user_id] = request.sid
+    join_room(user_room(user_id))
+    print(f'User registered: {user_id} with socket {request.sid}')
+    try:
+        emit_pending_messages(user_id)
+    except Exception as e:
+        db.session.rollback()
+        print(f'Error delivering held messages: {e}')
+
+@socketio.on('ack_delivery')
+def handle_ack_delivery(data):
+    """Trim delivered messages from the queue.
+
+    `up_to` acknowledges a stored pending_messages batch and gets the next
+    one; `message_id` acknowledges one message received live.
+    """
+    try:
+        user_id = session_user_id()
+        up_to = data.get('up_to')
+        message_id = data.get('message_id')
+
+        if not user_id:
+            emit('error', {'message': 'Unauthorized'})
+            return
+
+        if up_to is not None:
+            delivery_queue.ack(user_id, int(up_to))
+            db.session.commit()
+            emit_pending_messages(user_id)
+        elif message_id is not None:
+            delivery_queue.ack_message(user_id, int(message_id))
+            db.session.commit()
+        else:
+            emit('error', {'message': 'Missing required fields'})
+
+    except Exception as e:
+        db.session.rollback()
+        print(f'Error acknowledging delivery: {e}')
+        emit('error', {'message': 'Failed to acknowledge delivery'})
 
 @socketio.on('call_user')
 def handle_call_user(data):
@@ -129,20 +194,77 @@ def handle_ice_candidate(data):
 
 @socketio.on('send_message')
 def handle_send_message(data):
-    """Handle real-time message delivery"""
-    recipient_id = data.get('recipient_id')
-    sender_id = data.get('sender', {}).get('id')
-    
-    print(f'Message from {sender_id} to {recipient_id}')
-    print(f'Connected users: {connected_users}')
-    
-    # Send message to recipient if they're online
-    if recipient_id in connected_users:
-        recipient_sid = connected_users[recipient_id]
-        emit('receive_message', data, room=recipient_sid)
-        print(f'Message delivered to {recipient_id} at socket {recipient_sid}')
-    else:
-        print(f'Recipient {recipient_id} is not online')
+    """Relay a message saved through POST /api/messages to the recipient's sockets.
+
+    The message is already queued for the recipient, so it is emitted to
+    their room whether or not they look online here: sockets on other workers
+    get it live, and anything never acknowledged goes out on their next
+    register_user.
+    """
+    message = Message.query.get(data.get('id')) if data.get('id') else None
+    if not message or message.sender_id != session_user_id():
+        emit('error', {'message': 'Unauthorized'})
+        return
+
+    emit('receive_message', data, room=user_room(message.recipient_id))
+    print(f'Message {message.id} relayed from {message.sender_id} to {message.recipient_id}')
+
+def flush_read_receipt(app, reader_id, sender_id):
+    """Close the pair's coalescing window: advance the watermark once and send one receipt"""
+    receipts = app.extensions['read_receipts']
+    socketio.sleep(receipts.window)
+    with app.app_context():
+        message_id = receipts.pop(reader_id, sender_id)
+        if message_id is None:
+            return
+        try:
+            conversation_service.mark_read_up_to(reader_id, sender_id, message_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f'Error flushing read receipt: {e}')
+            return
+
+        # Notify sender that everything up to message_id was read
+        socketio.emit('message_read', {
+            'message_id': message_id,
+            'read_up_to': message_id,
+            'reader_id': reader_id
+        }, room=user_room(sender_id))
+
+        print(f'Messages up to {message_id} marked as read by {reader_id}')
+
+@socketio.on('mark_as_read')
+def handle_mark_as_read(data):
+    """Mark messages as read, coalescing bursts into one receipt per conversation"""
+    try:
+        message_id = data.get('message_id')
+        user_id = session_user_id()
+
+        if not message_id:
+            emit('error', {'message': 'Missing required fields'})
+            return
+
+        message = Message.query.get(message_id)
+        if not message:
+            emit('error', {'message': 'Message not found'})
+            return
+
+        # Only the logged-in recipient can mark as read
+        if not user_id or message.recipient_id != user_id:
+            emit('error', {'message': 'Unauthorized'})
+            return
+
+        # The first read in a window schedules the flush; later ones just raise the watermark
+        if get_read_receipts().add(user_id, message.sender_id, message.id):
+            socketio.start_background_task(
+                flush_read_receipt, current_app._get_current_object(), user_id, message.sender_id
+            )
+
+    except Exception as e:
+        db.session.rollback()
+        print(f'Error marking message as read: {e}')
+        emit('error', {'message': 'Failed to mark message as read'})
 
 @socketio.on('typing')
 def handle_typing(data):
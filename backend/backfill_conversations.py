@@ -0,0 +1,41 @@
+"""Build conversation summaries for existing direct messages
+
+Creates one summary row per pair of users that have exchanged messages,
+holding the latest message and both unread counts, and links the pair's
+messages to it. Safe to re-run:
+
+    python backfill_conversations.py [batch_size]
+"""
+import sys
+from sqlalchemy import case
+from app import create_app, db
+from app.models import Message
+from app.services.conversations import refresh_conversation
+
+
+def backfill_conversations(batch_size=500):
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            lower_id = case((Message.sender_id < Message.recipient_id, Message.sender_id), else_=Message.recipient_id)
+            higher_id = case((Message.sender_id < Message.recipient_id, Message.recipient_id), else_=Message.sender_id)
+            pairs = db.session.query(lower_id, higher_id).distinct().all()
+            print(f"Found {len(pairs)} conversations")
+            
+            for index, (user_id, other_id) in enumerate(pairs, start=1):
+                refresh_conversation(user_id, other_id)
+                if index % batch_size == 0:
+                    db.session.commit()
+                    print(f"Processed {index} conversations")
+            db.session.commit()
+            
+            print(f"\n✓ Conversation backfill completed: {len(pairs)} summaries written")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during conversation backfill: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    backfill_conversations(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,43 @@
+"""Populate materialized home timelines for existing users"""
+import sys
+from app import create_app, db
+from app.models import User
+from app.services import timeline_service
+from app.services.feed_service import followed_ids_query
+
+
+def backfill_timelines(batch_size=500):
+    """Copy each user's own and followed authors' recent posts onto their timeline"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            last_id = 0
+            total = 0
+            while True:
+                user_ids = [row[0] for row in db.session.query(User.id)
+                            .filter(User.id > last_id)
+                            .order_by(User.id)
+                            .limit(batch_size)]
+                if not user_ids:
+                    break
+                
+                for user_id in user_ids:
+                    added = timeline_service.backfill_author(user_id, user_id)
+                    for (author_id,) in followed_ids_query(user_id).all():
+                        added += timeline_service.backfill_author(user_id, author_id)
+                    db.session.commit()
+                    total += added
+                
+                last_id = user_ids[-1]
+                print(f"Processed users up to id {last_id} ({total} entries written)")
+            
+            print(f"\n✓ Timeline backfill completed: {total} entries written")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during timeline backfill: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    backfill_timelines()
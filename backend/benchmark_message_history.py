@@ -0,0 +1,67 @@
+"""Compare the query plans and timings of message history lookups
+
+Prints the plan of the old full-history OR query next to the paged
+conversation_id query, then times both for the busiest conversation:
+
+    python benchmark_message_history.py [page_size] [runs]
+"""
+import sys
+import time
+from sqlalchemy import func
+from app import create_app, db
+from app.models import Conversation, Message
+from app.services.conversations import pair_filter
+from app.services.pagination import keyset_page
+
+
+def explain(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    prefix = 'EXPLAIN QUERY PLAN' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN'
+    for row in db.session.execute(db.text(f'{prefix} {statement}')):
+        print('   ', ' | '.join(str(value) for value in row))
+
+
+def timed(fn, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+        db.session.expunge_all()
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def benchmark_message_history(page_size=50, runs=20):
+    app = create_app()
+
+    with app.app_context():
+        busiest = db.session.query(Message.conversation_id, func.count(Message.id).label('total'))\
+            .filter(Message.conversation_id.isnot(None))\
+            .group_by(Message.conversation_id)\
+            .order_by(func.count(Message.id).desc()).first()
+        if not busiest:
+            print("No linked messages found; run migrate_message_conversations.py first")
+            return
+        conversation = db.session.get(Conversation, busiest[0])
+        print(f"Conversation {conversation.id}: {busiest[1]} messages\n")
+
+        old_query = Message.query.filter(pair_filter(conversation.user_a_id, conversation.user_b_id))\
+            .order_by(Message.created_at.asc())
+        new_query = Message.query.filter(Message.conversation_id == conversation.id)\
+            .order_by(Message.created_at.desc(), Message.id.desc()).limit(page_size + 1)
+
+        print("Old: full history by sender/recipient")
+        explain(old_query)
+        print(f"\nNew: newest page of {page_size} by conversation_id")
+        explain(new_query)
+
+        old_ms = timed(lambda: old_query.all(), runs)
+        new_ms = timed(lambda: keyset_page(
+            Message.query.filter(Message.conversation_id == conversation.id),
+            Message.created_at, Message.id, None, page_size), runs)
+        print(f"\nOld: {old_ms:.2f} ms/request")
+        print(f"New: {new_ms:.2f} ms/request")
+
+if __name__ == '__main__':
+    benchmark_message_history(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    )
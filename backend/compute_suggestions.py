@@ -0,0 +1,28 @@
+"""Recompute "people you may know" suggestions for every user
+
+Reads the follow graph, party memberships and message partners once, scores
+candidates per user in memory and replaces the stored top-K rows. Run
+periodically (e.g. nightly from cron):
+
+    python compute_suggestions.py [batch_size]
+"""
+import sys
+from app import create_app, db
+from app.services.suggestions import compute_suggestions
+
+
+def run(batch_size=500):
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            written = compute_suggestions(batch_size)
+            print(f"\n✓ Suggestions computed: {written} rows written")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error computing suggestions: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
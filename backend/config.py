@@ -24,4 +24,82 @@ class Config:
     # Social Media Configuration
     MAX_POST_LENGTH = 280
     MAX_BIO_LENGTH = 500
-    MAX_USERNAME_LENGTH = 50
\ No newline at end of file
+    MAX_USERNAME_LENGTH = 50
+    
+    # Feed pagination
+    FEED_PAGE_SIZE = int(os.environ.get('FEED_PAGE_SIZE', '20'))
+    FEED_MAX_PAGE_SIZE = int(os.environ.get('FEED_MAX_PAGE_SIZE', '100'))
+    FEED_COMMENT_PREVIEW = int(os.environ.get('FEED_COMMENT_PREVIEW', '3'))
+    COMMENTS_PAGE_SIZE = int(os.environ.get('COMMENTS_PAGE_SIZE', '20'))
+    COMMENTS_MAX_PAGE_SIZE = int(os.environ.get('COMMENTS_MAX_PAGE_SIZE', '100'))
+    FOLLOW_LIST_PAGE_SIZE = int(os.environ.get('FOLLOW_LIST_PAGE_SIZE', '50'))
+    FOLLOW_LIST_MAX_PAGE_SIZE = int(os.environ.get('FOLLOW_LIST_MAX_PAGE_SIZE', '200'))
+    CONVERSATIONS_PAGE_SIZE = int(os.environ.get('CONVERSATIONS_PAGE_SIZE', '20'))
+    CONVERSATIONS_MAX_PAGE_SIZE = int(os.environ.get('CONVERSATIONS_MAX_PAGE_SIZE', '100'))
+    MESSAGES_PAGE_SIZE = int(os.environ.get('MESSAGES_PAGE_SIZE', '50'))
+    MESSAGES_MAX_PAGE_SIZE = int(os.environ.get('MESSAGES_MAX_PAGE_SIZE', '200'))
+    # Seconds socket read events are coalesced before one receipt is sent
+    READ_RECEIPT_WINDOW = float(os.environ.get('READ_RECEIPT_WINDOW', '0.5'))
+    # Seconds a view-once message stays readable after its recipient opens it
+    VIEW_ONCE_GRACE_SECONDS = int(os.environ.get('VIEW_ONCE_GRACE_SECONDS', '60'))
+    
+    # Background sweeper for expired messages and notes (0 disables it; see sweep_expired.py)
+    EXPIRY_SWEEP_INTERVAL = int(os.environ.get('EXPIRY_SWEEP_INTERVAL', '60'))
+    EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get('EXPIRY_SWEEP_BATCH_SIZE', '500'))
+    EXPIRY_SWEEP_MAX_BATCHES = int(os.environ.get('EXPIRY_SWEEP_MAX_BATCHES', '20'))
+    
+    # Delta sync change log (/api/messages/sync); older cursors get a reset
+    MESSAGE_SYNC_MAX_EVENTS = int(os.environ.get('MESSAGE_SYNC_MAX_EVENTS', '500'))
+    MESSAGE_EVENT_RETENTION_DAYS = int(os.environ.get('MESSAGE_EVENT_RETENTION_DAYS', '7'))
+    # Events younger than this are held back from cursors until in-flight commits land
+    MESSAGE_SYNC_SETTLE_SECONDS = int(os.environ.get('MESSAGE_SYNC_SETTLE_SECONDS', '5'))
+    
+    # Messages sent per batch when an offline recipient's socket joins
+    DELIVERY_BATCH_SIZE = int(os.environ.get('DELIVERY_BATCH_SIZE', '200'))
+    
+    # Direct message search (/api/messages/search)
+    MESSAGE_SEARCH_PAGE_SIZE = int(os.environ.get('MESSAGE_SEARCH_PAGE_SIZE', '20'))
+    MESSAGE_SEARCH_MAX_PAGE_SIZE = int(os.environ.get('MESSAGE_SEARCH_MAX_PAGE_SIZE', '100'))
+    MESSAGE_SEARCH_MAX_TERMS = int(os.environ.get('MESSAGE_SEARCH_MAX_TERMS', '8'))
+    MESSAGE_SEARCH_MIN_PREFIX = int(os.environ.get('MESSAGE_SEARCH_MIN_PREFIX', '3'))
+    
+    # Home timeline fan-out
+    TIMELINE_STORE = os.environ.get('TIMELINE_STORE', 'sql')
+    TIMELINE_FANOUT_ASYNC = os.environ.get('TIMELINE_FANOUT_ASYNC', 'true').lower() == 'true'
+    TIMELINE_FANOUT_BATCH_SIZE = int(os.environ.get('TIMELINE_FANOUT_BATCH_SIZE', '1000'))
+    # Authors with at least this many followers are merged in at read time instead
+    TIMELINE_FANOUT_MAX_FOLLOWERS = int(os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', '10000'))
+    TIMELINE_BACKFILL_POSTS = int(os.environ.get('TIMELINE_BACKFILL_POSTS', '50'))
+    
+    # Uploaded media
+    BLOB_STORE_ROOT = os.environ.get('BLOB_STORE_ROOT', 'static/blobs')
+    MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', '86400'))
+    AVATAR_CACHE_MAX_AGE = int(os.environ.get('AVATAR_CACHE_MAX_AGE', '31536000'))
+    
+    # Image derivative pipeline
+    IMAGE_PIPELINE_ASYNC = os.environ.get('IMAGE_PIPELINE_ASYNC', 'true').lower() == 'true'
+    IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS', '2'))
+    IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', '80'))
+    
+    # Response cache for feed and profile post lists ('memory' or 'redis')
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '60'))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+    
+    # In-memory username search index, rebuilt after the TTL to pick up other workers' writes
+    USER_SEARCH_INDEX_TTL = int(os.environ.get('USER_SEARCH_INDEX_TTL', '300'))
+    USER_SEARCH_MIN_SIMILARITY = float(os.environ.get('USER_SEARCH_MIN_SIMILARITY', '0.3'))
+    # Names scanned at most for 1-2 character queries, which trigrams cannot serve
+    USER_SEARCH_SHORT_SCAN_LIMIT = int(os.environ.get('USER_SEARCH_SHORT_SCAN_LIMIT', '5000'))
+    
+    # Largest id list accepted by /api/users/batch
+    USERS_BATCH_MAX_IDS = int(os.environ.get('USERS_BATCH_MAX_IDS', '200'))
+    
+    # Offline "people you may know" job (see compute_suggestions.py)
+    SUGGESTIONS_PER_USER = int(os.environ.get('SUGGESTIONS_PER_USER', '50'))
+    SUGGESTIONS_MAX_PARTY_SIZE = int(os.environ.get('SUGGESTIONS_MAX_PARTY_SIZE', '200'))
+    
+    # Process-local follow adjacency cache; the TTL bounds staleness across workers
+    FOLLOW_GRAPH_MAX_USERS = int(os.environ.get('FOLLOW_GRAPH_MAX_USERS', '50000'))
+    FOLLOW_GRAPH_TTL = int(os.environ.get('FOLLOW_GRAPH_TTL', '30'))
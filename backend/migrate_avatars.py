@@ -0,0 +1,54 @@
+"""Convert base64 data-URI avatars in user.profile_pic into blob store files
+
+Each converted user ends up with a short /api/avatars/<key> URL in
+profile_pic. Users are processed in id-ordered batches:
+
+    python migrate_avatars.py [batch_size]
+"""
+import base64
+import sys
+from app import create_app, db
+from app.models import User
+from app.services.avatars import store_avatar
+
+
+def migrate_avatars(batch_size=100):
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            converted = 0
+            failed = 0
+            last_id = 0
+            while True:
+                rows = db.session.query(User.id, User.profile_pic)\
+                    .filter(User.id > last_id, User.profile_pic.like('data:%'))\
+                    .order_by(User.id)\
+                    .limit(batch_size).all()
+                if not rows:
+                    break
+                
+                for user_id, profile_pic in rows:
+                    try:
+                        header, encoded = profile_pic.split(',', 1)
+                        avatar_path = store_avatar(base64.b64decode(encoded))
+                    except Exception as e:
+                        print(f"✗ Skipping user {user_id}: {str(e)}")
+                        failed += 1
+                        continue
+                    User.query.filter_by(id=user_id).update({'profile_pic': avatar_path})
+                    converted += 1
+                db.session.commit()
+                
+                last_id = rows[-1][0]
+                print(f"Converted {converted} avatars (up to user {last_id})")
+            
+            print(f"\n✓ Avatar migration completed: {converted} converted, {failed} skipped")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during avatar migration: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_avatars(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
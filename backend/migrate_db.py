@@ -77,8 +77,27 @@ def update_schema():
                 db.session.execute(text('ALTER TABLE post ADD COLUMN image_mimetype VARCHAR(100)'))
                 db.session.commit()
             
+            post_indexes = [idx['name'] for idx in inspector.get_indexes('post')]
+            
+            if 'ix_post_user_id' not in post_indexes:
+                print("Adding user_id index to post table...")
+                db.session.execute(text('CREATE INDEX ix_post_user_id ON post (user_id)'))
+                db.session.commit()
+            
+            if 'ix_post_created_at_id' not in post_indexes:
+                print("Adding (created_at, id) feed index to post table...")
+                db.session.execute(text('CREATE INDEX ix_post_created_at_id ON post (created_at, id)'))
+                db.session.commit()
+            
             print("Post table schema updated successfully!")
             
+            comment_indexes = [idx['name'] for idx in inspector.get_indexes('comment')]
+            
+            if 'ix_comment_post_created_id' not in comment_indexes:
+                print("Adding (post_id, created_at, id) index to comment table...")
+                db.session.execute(text('CREATE INDEX ix_comment_post_created_id ON comment (post_id, created_at, id)'))
+                db.session.commit()
+            
         except Exception as e:
             print(f"Error updating schema: {e}")
             db.session.rollback()
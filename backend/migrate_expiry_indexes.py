@@ -0,0 +1,45 @@
+"""Add the `expires_at` indexes the expiry sweeper scans
+
+Without them every sweep is a full scan of the message and note tables.
+The media_deletion queue table is created by the app on startup:
+
+    python migrate_expiry_indexes.py
+"""
+import sys
+from sqlalchemy import inspect
+from app import create_app, db
+
+
+EXPIRY_INDEXES = {
+    'message': {'ix_message_expires_at': '(expires_at)'},
+    'note': {'ix_note_expires_at': '(expires_at)'},
+}
+
+
+def add_expiry_indexes():
+    inspector = inspect(db.engine)
+    for table, table_indexes in EXPIRY_INDEXES.items():
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+        for name, columns in table_indexes.items():
+            if name not in indexes:
+                print(f"Adding index {name}...")
+                db.session.execute(db.text(f'CREATE INDEX {name} ON {table} {columns}'))
+                db.session.commit()
+                print(f"✓ Added index {name}")
+
+
+def migrate_expiry_indexes():
+    app = create_app()
+
+    with app.app_context():
+        try:
+            add_expiry_indexes()
+            print("\n✓ Expiry indexes are in place")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error adding expiry indexes: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_expiry_indexes()
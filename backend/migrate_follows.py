@@ -0,0 +1,73 @@
+"""Move legacy `followers` rows into the `follow` table
+
+The follow graph used to be split between the `followers` association table
+and the `follow` model. This copies every legacy row that is not already in
+`follow`, adds the reverse-direction and list indexes, then recomputes
+follower counters:
+
+    python migrate_follows.py [--drop-legacy]
+"""
+import sys
+from sqlalchemy import inspect
+from app import create_app, db
+from app.services.counters import reconcile_user_counters
+
+
+FOLLOW_INDEXES = {
+    'ix_follow_following_follower': '(following_id, follower_id)',
+    'ix_follow_following_created_id': '(following_id, created_at, id)',
+    'ix_follow_follower_created_id': '(follower_id, created_at, id)',
+}
+
+
+def add_follow_indexes():
+    inspector = inspect(db.engine)
+    indexes = [idx['name'] for idx in inspector.get_indexes('follow')]
+    for name, columns in FOLLOW_INDEXES.items():
+        if name not in indexes:
+            print(f"Adding index {name}...")
+            db.session.execute(db.text(f'CREATE INDEX {name} ON follow {columns}'))
+            db.session.commit()
+            print(f"✓ Added index {name}")
+
+
+def copy_legacy_follows():
+    """Insert legacy rows missing from `follow`, returning how many were copied"""
+    result = db.session.execute(db.text(
+        'INSERT INTO follow (follower_id, following_id, created_at) '
+        'SELECT f.follower_id, f.followed_id, CURRENT_TIMESTAMP FROM followers f '
+        'WHERE f.follower_id <> f.followed_id AND NOT EXISTS ('
+        '  SELECT 1 FROM follow x WHERE x.follower_id = f.follower_id AND x.following_id = f.followed_id)'
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def migrate_follows(drop_legacy=False):
+    app = create_app()
+
+    with app.app_context():
+        try:
+            add_follow_indexes()
+
+            if 'followers' not in inspect(db.engine).get_table_names():
+                print("No legacy 'followers' table found")
+            else:
+                copied = copy_legacy_follows()
+                print(f"✓ Copied {copied} legacy follow rows")
+                if drop_legacy:
+                    db.session.execute(db.text('DROP TABLE followers'))
+                    db.session.commit()
+                    print("✓ Dropped legacy 'followers' table")
+
+            print("Reconciling follower counters...")
+            fixed = reconcile_user_counters()
+            print(f"✓ Corrected {fixed} user rows")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during follow migration: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_follows('--drop-legacy' in sys.argv)
@@ -0,0 +1,76 @@
+"""Link existing direct messages to their conversation
+
+Adds `message.conversation_id` and the (conversation_id, created_at, id)
+index that message history pages walk, then assigns every message to its
+pair's conversation, creating summaries where missing. Safe to re-run:
+
+    python migrate_message_conversations.py [batch_size]
+"""
+import sys
+from sqlalchemy import case, inspect
+from app import create_app, db
+from app.models import Message
+from app.services.conversations import refresh_conversation
+
+
+MESSAGE_INDEXES = {
+    'ix_message_conversation_created_id': '(conversation_id, created_at, id)',
+}
+
+
+def add_conversation_column():
+    inspector = inspect(db.engine)
+    columns = [col['name'] for col in inspector.get_columns('message')]
+    if 'conversation_id' not in columns:
+        print("Adding conversation_id column to message table...")
+        db.session.execute(db.text('ALTER TABLE message ADD COLUMN conversation_id INTEGER NULL'))
+        if db.engine.dialect.name == 'mysql':
+            db.session.execute(db.text(
+                'ALTER TABLE message ADD CONSTRAINT fk_message_conversation '
+                'FOREIGN KEY (conversation_id) REFERENCES conversation (id) ON DELETE SET NULL'
+            ))
+        db.session.commit()
+        print("✓ Added conversation_id column")
+
+
+def add_message_indexes():
+    inspector = inspect(db.engine)
+    indexes = [idx['name'] for idx in inspector.get_indexes('message')]
+    for name, columns in MESSAGE_INDEXES.items():
+        if name not in indexes:
+            print(f"Adding index {name}...")
+            db.session.execute(db.text(f'CREATE INDEX {name} ON message {columns}'))
+            db.session.commit()
+            print(f"✓ Added index {name}")
+
+
+def migrate_message_conversations(batch_size=500):
+    app = create_app()
+
+    with app.app_context():
+        try:
+            add_conversation_column()
+            add_message_indexes()
+
+            lower_id = case((Message.sender_id < Message.recipient_id, Message.sender_id), else_=Message.recipient_id)
+            higher_id = case((Message.sender_id < Message.recipient_id, Message.recipient_id), else_=Message.sender_id)
+            pairs = db.session.query(lower_id, higher_id)\
+                .filter(Message.conversation_id.is_(None)).distinct().all()
+            print(f"Found {len(pairs)} conversations with unlinked messages")
+
+            for index, (user_id, other_id) in enumerate(pairs, start=1):
+                refresh_conversation(user_id, other_id)
+                if index % batch_size == 0:
+                    db.session.commit()
+                    print(f"Processed {index} conversations")
+            db.session.commit()
+
+            print(f"\n✓ Message migration completed: {len(pairs)} conversations linked")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during message migration: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_message_conversations(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,108 @@
+"""Move inline post images (post.image_data) into the content-addressed blob store
+
+Processes rows in id-ordered chunks so it can run against a live database and
+be resumed at any point:
+
+    python migrate_post_images.py [batch_size]
+"""
+import sys
+from sqlalchemy import inspect
+from app import create_app, db
+from app.models import Post, PostImageVariant
+from app.services.blob_store import get_blob_store
+from app.services.image_pipeline import generate_post_variants
+
+
+def add_image_key_column():
+    inspector = inspect(db.engine)
+    columns = [col['name'] for col in inspector.get_columns('post')]
+    if 'image_key' not in columns:
+        print("Adding 'image_key' column to 'post'...")
+        with db.engine.connect() as conn:
+            conn.execute(db.text('ALTER TABLE post ADD COLUMN image_key VARCHAR(64)'))
+            conn.commit()
+        print("✓ Added 'image_key' column")
+
+
+def generate_missing_variants(batch_size):
+    """Render resized variants for uploaded images that have none yet.
+
+    A post whose blob is missing or undecodable is logged and skipped, so one
+    bad image cannot stop the run; reruns retry it and move on past it.
+    Returns (generated, failed_ids).
+    """
+    generated = 0
+    failed_ids = []
+    last_id = 0
+    while True:
+        post_ids = [row[0] for row in db.session.query(Post.id)
+                    .filter(Post.id > last_id,
+                            Post.image_key.isnot(None),
+                            ~db.exists().where(PostImageVariant.post_id == Post.id))
+                    .order_by(Post.id)
+                    .limit(batch_size)]
+        if not post_ids:
+            return generated, failed_ids
+        
+        for post_id in post_ids:
+            try:
+                if generate_post_variants(post_id):
+                    generated += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"✗ Skipping post {post_id}: {str(e)}")
+                failed_ids.append(post_id)
+        last_id = post_ids[-1]
+        print(f"Generated variants for {generated} posts (up to post {last_id})")
+
+
+def migrate_post_images(batch_size=50):
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            add_image_key_column()
+            store = get_blob_store()
+            table = Post.__table__
+            
+            moved = 0
+            last_id = 0
+            while True:
+                rows = db.session.execute(
+                    db.select(table.c.id, table.c.image_data)
+                    .where(table.c.id > last_id,
+                           table.c.image_data.isnot(None),
+                           table.c.image_key.is_(None))
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                
+                for post_id, image_data in rows:
+                    key = store.put(image_data)
+                    db.session.execute(
+                        table.update()
+                        .where(table.c.id == post_id)
+                        .values(image_key=key, image_data=None)
+                    )
+                db.session.commit()
+                
+                moved += len(rows)
+                last_id = rows[-1][0]
+                print(f"Moved {moved} images (up to post {last_id})")
+            
+            generated, failed_ids = generate_missing_variants(batch_size)
+            
+            print(f"\n✓ Post image migration completed: {moved} images moved, "
+                  f"variants generated for {generated} posts, {len(failed_ids)} skipped")
+            if failed_ids:
+                print(f"  Posts without variants: {', '.join(str(post_id) for post_id in failed_ids)}")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during post image migration: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_post_images(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
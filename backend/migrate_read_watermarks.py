@@ -0,0 +1,55 @@
+"""Add per-conversation read watermarks
+
+Adds `read_up_to_a`/`read_up_to_b` to the conversation table, seeds them
+from messages already flagged `is_read` and recomputes unread counts from
+them. Safe to re-run:
+
+    python migrate_read_watermarks.py [batch_size]
+"""
+import sys
+from sqlalchemy import inspect
+from app import create_app, db
+from app.models import Conversation
+from app.services.conversations import refresh_conversation
+
+
+WATERMARK_COLUMNS = ('read_up_to_a', 'read_up_to_b')
+
+
+def add_watermark_columns():
+    inspector = inspect(db.engine)
+    columns = [col['name'] for col in inspector.get_columns('conversation')]
+    for name in WATERMARK_COLUMNS:
+        if name not in columns:
+            print(f"Adding {name} column to conversation table...")
+            db.session.execute(db.text(f'ALTER TABLE conversation ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'))
+            db.session.commit()
+            print(f"✓ Added {name} column")
+
+
+def migrate_read_watermarks(batch_size=500):
+    app = create_app()
+
+    with app.app_context():
+        try:
+            add_watermark_columns()
+
+            pairs = db.session.query(Conversation.user_a_id, Conversation.user_b_id).all()
+            print(f"Found {len(pairs)} conversations")
+
+            for index, (user_id, other_id) in enumerate(pairs, start=1):
+                refresh_conversation(user_id, other_id)
+                if index % batch_size == 0:
+                    db.session.commit()
+                    print(f"Processed {index} conversations")
+            db.session.commit()
+
+            print(f"\n✓ Read watermark migration completed: {len(pairs)} conversations updated")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during read watermark migration: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate_read_watermarks(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,50 @@
+"""Rebuild the direct message search index
+
+Re-indexes every message in id order, replacing each batch's rows in its
+own transaction so search keeps answering and live writes are never blocked
+behind one huge delete. New messages are indexed as they are sent, so this
+is only needed for history written before search existed or after changing
+the tokenizer:
+
+    python rebuild_message_index.py [batch_size]
+"""
+import sys
+from app import create_app, db
+from app.models import Message, MessageTerm
+from app.services.message_search import message_terms, remove_messages
+
+
+def rebuild_message_index(batch_size=1000):
+    app = create_app()
+
+    with app.app_context():
+        try:
+            indexed = 0
+            last_id = 0
+            while True:
+                messages = Message.query.filter(Message.id > last_id)\
+                    .order_by(Message.id).limit(batch_size).all()
+                if not messages:
+                    break
+
+                # Media-only messages are included so any stale rows of theirs go too
+                remove_messages([message.id for message in messages])
+                rows = [row for message in messages if message.content for row in message_terms(message)]
+                if rows:
+                    db.session.execute(MessageTerm.__table__.insert(), rows)
+                db.session.commit()
+
+                indexed += len(messages)
+                last_id = messages[-1].id
+                db.session.expunge_all()
+                print(f"Indexed {indexed} messages")
+
+            print(f"\n✓ Message index rebuilt: {indexed} messages")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error rebuilding message index: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    rebuild_message_index(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,50 @@
+"""Add engagement counter columns and recompute drifted counter values
+
+Run once after deploying the counter columns, then periodically (e.g. from
+cron) to repair any drift:
+
+    python reconcile_counters.py [batch_size]
+"""
+import sys
+from sqlalchemy import inspect
+from app import create_app, db
+from app.services.counters import reconcile_all
+
+COUNTER_COLUMNS = {
+    'user': ['follower_count', 'following_count', 'post_count'],
+    'post': ['like_count', 'comment_count'],
+}
+
+
+def add_counter_columns():
+    """Add any missing counter columns to existing tables"""
+    inspector = inspect(db.engine)
+    for table, counter_columns in COUNTER_COLUMNS.items():
+        columns = [col['name'] for col in inspector.get_columns(table)]
+        for column in counter_columns:
+            if column not in columns:
+                print(f"Adding '{column}' column to '{table}'...")
+                with db.engine.connect() as conn:
+                    conn.execute(db.text(f'ALTER TABLE `{table}` ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0'))
+                    conn.commit()
+                print(f"✓ Added '{column}' column")
+
+
+def reconcile_counters(batch_size=1000):
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            add_counter_columns()
+            
+            print("Reconciling counters...")
+            fixed = reconcile_all(batch_size)
+            print(f"✓ Corrected {fixed['users']} user rows and {fixed['posts']} post rows")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during counter reconciliation: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    reconcile_counters(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -1,6 +1,8 @@
 from app import create_app, socketio
+from app.services.expiry import start_expiry_sweeper
 
 app = create_app()
 
 if __name__ == '__main__':
+    start_expiry_sweeper(app, socketio)
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""Delete expired messages and notes once, e.g. from cron
+
+The API server runs the same sweep every EXPIRY_SWEEP_INTERVAL seconds;
+use this when that is disabled or to drain a large backlog:
+
+    python sweep_expired.py [--until-empty]
+"""
+import sys
+from app import create_app, db
+from app.services.expiry import get_expiry_sweeper
+
+
+def sweep_expired(until_empty=False):
+    app = create_app()
+
+    with app.app_context():
+        try:
+            sweeper = get_expiry_sweeper()
+            while True:
+                result = sweeper.sweep()
+                print(f"Deleted {result['messages']} messages, {result['notes']} notes "
+                      f"and {result['events']} sync events")
+                limit = sweeper.batch_size * sweeper.max_batches
+                if not until_empty or all(count < limit for count in result.values()):
+                    break
+
+            stats = sweeper.stats()
+            print(f"\n✓ Sweep completed: {stats['messages_deleted']} messages, "
+                  f"{stats['notes_deleted']} notes, {stats['media_queued']} media files queued")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n✗ Error during sweep: {str(e)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    sweep_expired('--until-empty' in sys.argv)
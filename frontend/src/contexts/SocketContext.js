@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useEffect, useState } from 'react';
+import React, { createContext, useCallback, useContext, useEffect, useState } from 'react';
 import { io } from 'socket.io-client';
 import { useAuth } from './AuthContext';
 
@@ -15,6 +15,8 @@ export const useSocket = () => {
 export const SocketProvider = ({ children }) => {
   const [socket, setSocket] = useState(null);
   const [connected, setConnected] = useState(false);
+  // Latest batch of messages held on the server while this user was offline
+  const [pendingBatch, setPendingBatch] = useState(null);
   const { user } = useAuth();
 
   useEffect(() => {
@@ -24,12 +26,15 @@ export const SocketProvider = ({ children }) => {
         setSocket(null);
         setConnected(false);
       }
+      setPendingBatch(null);
       return;
     }
 
     // Initialize socket connection
     const newSocket = io('http://localhost:5000', {
       transports: ['websocket', 'polling'],
+      // Send the session cookie so the server knows which user this socket belongs to
+      withCredentials: true,
       reconnection: true,
       reconnectionDelay: 1000,
       reconnectionAttempts: 5
@@ -42,6 +47,18 @@ export const SocketProvider = ({ children }) => {
       newSocket.emit('register_user', { userId: user.id });
     });
 
+    // Messages stay queued on the server until a page has shown the batch
+    // and acknowledged it with acknowledgePendingBatch
+    newSocket.on('pending_messages', (data) => {
+      setPendingBatch(data);
+    });
+
+    newSocket.on('receive_message', (data) => {
+      if (data && data.id) {
+        newSocket.emit('ack_delivery', { message_id: data.id });
+      }
+    });
+
     newSocket.on('disconnect', () => {
       console.log('Socket disconnected');
       setConnected(false);
@@ -59,9 +76,19 @@ export const SocketProvider = ({ children }) => {
     };
   }, [user]);
 
+  // Trims the batch from the server queue, which then sends the next one
+  const acknowledgePendingBatch = useCallback((batch) => {
+    if (socket && batch) {
+      socket.emit('ack_delivery', { up_to: batch.up_to });
+    }
+    setPendingBatch(current => (current === batch ? null : current));
+  }, [socket]);
+
   const value = {
     socket,
-    connected
+    connected,
+    pendingBatch,
+    acknowledgePendingBatch
   };
 
   return (
@@ -12,7 +12,7 @@ import VideoCall from '../components/VideoCall';
 
 const Messages = () => {
   const { user } = useAuth();
-  const { socket } = useSocket();
+  const { socket, pendingBatch, acknowledgePendingBatch } = useSocket();
   const [conversations, setConversations] = useState([]);
   const [selectedConversation, setSelectedConversation] = useState(null);
   const [messages, setMessages] = useState([]);
@@ -136,6 +136,27 @@ const Messages = () => {
     };
   }, [socket, selectedConversation, user, fetchConversations]);
 
+  // Messages held on the server while offline; acknowledged once shown
+  useEffect(() => {
+    if (!pendingBatch) return;
+
+    if (selectedConversation) {
+      const incoming = pendingBatch.messages.filter(
+        msg => msg.sender?.id === selectedConversation.user.id
+      );
+      if (incoming.length) {
+        setMessages(prev => {
+          const known = new Set(prev.map(msg => msg.id));
+          return [...prev, ...incoming.filter(msg => !known.has(msg.id))];
+        });
+        scrollToBottom();
+      }
+    }
+
+    fetchConversations();
+    acknowledgePendingBatch(pendingBatch);
+  }, [pendingBatch, selectedConversation, fetchConversations, acknowledgePendingBatch]);
+
   // Auto scroll
   useEffect(() => {
     scrollToBottom();